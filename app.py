@@ -17,8 +17,10 @@ def create_app():
     with app.app_context():
         wait_for_db()
         
-        from models import user, task, file, report, group, notification, join_request
-        db.create_all()
+        from models import user, task, file, report, group, notification, join_request, task_tombstone, scheduler_state, data_version
+        import utils.subtask_counters  # Đăng ký event giữ counter subtasks đồng bộ
+        import utils.data_versions  # Đăng ký event tăng version tasks/users/groups cho ETag
+        run_schema_migrations()
         
         # Initialize default admin and data
         init_default_data()
@@ -73,9 +75,13 @@ def create_app():
     
     # Register blueprints
     register_blueprints(app)
+    register_commands(app)
     
-    # Setup notification scheduler
-    setup_scheduler(app)
+    # Setup notification scheduler (tắt khi job chạy ở worker riêng: worker.py)
+    if app.config.get('SCHEDULER_ENABLED', True):
+        setup_scheduler(app)
+    else:
+        print("⏭️ Scheduler disabled in web process (SCHEDULER_ENABLED=false)")
 
     return app
 
@@ -93,6 +99,42 @@ def wait_for_db():
     print("❌ Could not connect to database after 30 seconds")
     return False
 
+def run_schema_migrations():
+    """Tạo/cập nhật schema bằng migration có version (utils/migrations.py)"""
+    try:
+        from utils.migrations import run_migrations
+        applied = run_migrations()
+        if applied:
+            print(f"✅ Applied {len(applied)} migration(s): {', '.join(applied)}")
+    except Exception as e:
+        print(f"⚠️ Warning: Database migration failed: {e}")
+
+def register_commands(app):
+    """Register CLI commands (flask <command>)"""
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Chạy các migration chưa áp dụng"""
+        from utils.migrations import run_migrations, get_applied_versions, MIGRATIONS
+        applied = run_migrations()
+        print(f"✅ Applied {len(applied)} migration(s)")
+        current = get_applied_versions()
+        for version, name, _ in MIGRATIONS:
+            print(f"   {'[x]' if version in current else '[ ]'} {version:03d}_{name}")
+    
+    @app.cli.command('backfill-week-keys')
+    def backfill_week_keys_command():
+        """Gán week_key cho các task chưa có"""
+        from utils.migrations import backfill_task_week_keys
+        updated = backfill_task_week_keys()
+        print(f"✅ Backfilled week_key for {updated} tasks")
+    
+    @app.cli.command('repair-subtask-counters')
+    def repair_subtask_counters_command():
+        """Đếm lại subtasks_total / subtasks_done cho tất cả tasks"""
+        from utils.subtask_counters import repair_subtask_counters
+        repaired = repair_subtask_counters()
+        print(f"✅ Repaired subtask counters for {repaired} tasks")
+
 def register_blueprints(app):
     """Register all blueprints"""
     try:
@@ -0,0 +1,236 @@
+# explain_report.py - So sánh EXPLAIN trước/sau khi có index cho các query nóng
+#
+# Chạy trên DB tạm (SQLite hoặc MySQL), --seed tạo dữ liệu mẫu khi bảng tasks còn trống:
+#   DATABASE_URL=sqlite:///explain.db python explain_report.py --seed > explain_report.md
+# SQL không viết tay: mỗi endpoint được gọi qua test client (job deadline gọi đúng hàm tạo query),
+# script ghi lại câu lệnh SQLAlchemy gửi xuống DB cùng params rồi EXPLAIN chính câu đó.
+# "Before" tắt index bằng IGNORE INDEX (MySQL) / NOT INDEXED (SQLite) trên bảng chính,
+# "After" để optimizer tự chọn index như khi chạy thật.
+import argparse
+import contextlib
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+# Script chỉ đọc dữ liệu, không chạy job nền
+os.environ.setdefault('SCHEDULER_ENABLED', 'False')
+
+from sqlalchemy import event
+from app import create_app
+from database import db
+
+now = datetime.utcnow()
+
+
+def seed_sample_data(n_tasks):
+    """Dữ liệu mẫu: 1 admin, 5 nhóm (mỗi nhóm 1 leader), 200 employee, tasks/subtasks, notifications, reports"""
+    from models.user import User
+    from models.group import Group
+    from models.task import Task
+    from models.notification import Notification, NotificationType
+    from models.report import Report
+    from models.join_request import JoinRequest, JoinRequestStatus
+    from utils.bulk_insert import bulk_insert
+    from utils.notifications import notification_row
+    from utils.week_calendar import week_key_for
+
+    rng = random.Random(1)
+    groups = [Group(name=f'Explain group {i}') for i in range(5)]
+    db.session.add_all(groups)
+    db.session.flush()
+    users = [User(name='Explain admin', email='explain-admin@example.com', password_hash='-', role='admin')]
+    users += [User(name=f'Leader {i}', email=f'explain-leader{i}@example.com', password_hash='-',
+                   role='leader', group_id=group.id) for i, group in enumerate(groups)]
+    users += [User(name=f'Employee {i}', email=f'explain-employee{i}@example.com', password_hash='-',
+                   role='employee', group_id=rng.choice(groups).id) for i in range(200)]
+    db.session.add_all(users)
+    db.session.flush()
+    for group, leader in zip(groups, users[1:6]):
+        group.leader_id = leader.id
+
+    def task_row(i, parent_id=None):
+        created_at = now - timedelta(minutes=n_tasks - i)
+        return {
+            'title': f'Task {i}', 'description': None,
+            'status': rng.choice(['todo', 'doing', 'done']), 'priority': rng.choice(['low', 'medium', 'high']),
+            'deadline': now + timedelta(hours=rng.randint(-24 * 30, 24 * 30)),
+            'created_at': created_at, 'updated_at': created_at, 'week_key': week_key_for(created_at),
+            'subtasks_total': 0, 'subtasks_done': 0, 'parent_task_id': parent_id,
+            'assigner_id': rng.choice(users[:6]).id, 'assignee_id': rng.choice(users[6:]).id,
+            'group_id': rng.choice(groups).id
+        }
+
+    main_ids = bulk_insert(Task.__table__, [task_row(i) for i in range(n_tasks * 4 // 5)])
+    bulk_insert(Task.__table__, [
+        task_row(i, rng.choice(main_ids)) for i in range(n_tasks * 4 // 5, n_tasks)
+    ])
+    bulk_insert(Notification.__table__, [notification_row(
+        rng.choice(users).id, 'Sample', 'Sample notification', rng.choice(list(NotificationType)),
+        task_id=rng.choice(main_ids), is_important=False, created_at=now - timedelta(minutes=i)
+    ) | {'is_read': rng.random() < 0.7} for i in range(n_tasks)])
+    bulk_insert(Report.__table__, [{
+        'user_id': rng.choice(users).id, 'week': '2025-W01', 'file_path': f'reports/sample_{i}.xlsx',
+        'created_at': now - timedelta(hours=i)
+    } for i in range(n_tasks // 10)])
+    bulk_insert(JoinRequest.__table__, [{
+        'user_id': rng.choice(users[6:]).id, 'group_id': rng.choice(groups).id,
+        'status': rng.choice(list(JoinRequestStatus)), 'message': None,
+        'created_at': now - timedelta(hours=i), 'updated_at': now - timedelta(hours=i)
+    } for i in range(n_tasks // 10)])
+    db.session.commit()
+
+
+def sample_ids():
+    """ID có trong DB để gọi endpoint, None nếu thiếu dữ liệu"""
+    from models.user import User
+    from models.task import Task
+
+    admin = User.query.filter_by(role='admin').first()
+    leader = User.query.filter(User.role == 'leader', User.group_id.isnot(None)).first()
+    employee = db.session.query(User).join(Task, Task.assignee_id == User.id).filter(User.role == 'employee').first()
+    parent_id = db.session.query(Task.parent_task_id).filter(Task.parent_task_id.isnot(None)).limit(1).scalar()
+    if not (admin and leader and employee and parent_id):
+        return None
+    return {'admin': admin.id, 'leader': leader.id, 'employee': employee.id,
+            'group': leader.group_id, 'parent': parent_id}
+
+
+def deadline_check_query():
+    """Query "sắp đến hạn" lần quét đầu tiên của check_task_deadlines"""
+    from models.task import Task
+    from models.notification import NotificationType
+    from utils.notification_scheduler import DEADLINE_SOON_WINDOW, _candidates_with_flag
+
+    return _candidates_with_flag(
+        NotificationType.TASK_DEADLINE_SOON, now - DEADLINE_SOON_WINDOW,
+        Task.deadline <= now + DEADLINE_SOON_WINDOW, Task.deadline > now
+    ).all()
+
+
+def hot_queries(ids):
+    """(tên, URL hoặc hàm, bảng, index được so sánh, cột nhận ra câu SQL chính)"""
+    return [
+        ('GET /api/tasks/user/<id>', f"/api/tasks/user/{ids['employee']}?limit=50",
+         'tasks', ['ix_tasks_assignee_created'], 'tasks.assignee_id'),
+        ('GET /api/tasks/all (employee)', f"/api/tasks/all?user_id={ids['employee']}&limit=50",
+         'tasks', ['ix_tasks_assignee_created', 'ix_tasks_assigner_created'], 'tasks.assigner_id'),
+        ('GET /api/tasks/all (leader)', f"/api/tasks/all?user_id={ids['leader']}&limit=50",
+         'tasks', ['ix_tasks_assignee_created', 'ix_tasks_assigner_created'], 'tasks.assigner_id'),
+        ('GET /api/tasks/dashboard?group_id=', f"/api/tasks/dashboard?group_id={ids['group']}",
+         'tasks', ['ix_tasks_group_status'], 'tasks.group_id'),
+        ('GET /api/tasks/parent-options', f"/api/tasks/parent-options?group_id={ids['group']}",
+         'tasks', ['ix_tasks_group_status'], 'tasks.group_id'),
+        ('scheduler check_task_deadlines', deadline_check_query,
+         'tasks', ['ix_tasks_deadline_status'], 'tasks.deadline'),
+        ('GET /api/tasks/<id>/subtasks', f"/api/tasks/{ids['parent']}/subtasks",
+         'tasks', ['ix_tasks_parent'], 'tasks.parent_task_id'),
+        ('GET /api/notifications/list?unread_only=1', f"/api/notifications/list?user_id={ids['employee']}&unread_only=1",
+         'notifications', ['ix_notifications_user_read_created'], 'notifications.is_read'),
+        ('GET /api/reports/list', f"/api/reports/list?user_id={ids['employee']}",
+         'reports', ['ix_reports_user_created'], 'reports.user_id'),
+        ('GET /api/groups/join-requests', f"/api/groups/join-requests?user_id={ids['admin']}&group_id={ids['group']}",
+         'join_requests', ['ix_join_requests_group_status'], 'join_requests.group_id'),
+    ]
+
+
+def capture(app, source, table, match):
+    """Chạy endpoint / hàm, trả về (SQL, params) của câu lệnh đầu tiên đọc bảng table và lọc theo cột match"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        if callable(source):
+            source()
+        else:
+            response = app.test_client().get(source)
+            if response.status_code != 200:
+                raise RuntimeError(f'{source} returned {response.status_code}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    for statement, parameters in statements:
+        position = main_from(statement, table)
+        if position is not None and match in statement[position:].partition('\nWHERE ')[2]:
+            return statement, parameters
+    raise RuntimeError(f'No query on {table} filtering {match} captured for {source}')
+
+
+def main_from(sql, table):
+    """Vị trí ngay sau tên bảng trong FROM ngoài cùng (không tính subquery), None nếu bảng chính khác table"""
+    depth = 0
+    for token in re.finditer(r'\(|\)|\bFROM (\w+)', sql):
+        if token.group() == '(':
+            depth += 1
+        elif token.group() == ')':
+            depth -= 1
+        elif depth == 0:
+            return token.end() if token.group(1) == table else None
+    return None
+
+
+def without_indexes(sql, table, indexes):
+    """Gắn hint tắt index vào bảng chính của câu SQL"""
+    if db.engine.dialect.name == 'mysql':
+        hint = f"IGNORE INDEX ({', '.join(indexes)})"
+    else:
+        hint = 'NOT INDEXED'
+    position = main_from(sql, table)
+    return f'{sql[:position]} {hint}{sql[position:]}'
+
+
+def explain(sql, parameters):
+    prefix = 'EXPLAIN' if db.engine.dialect.name == 'mysql' else 'EXPLAIN QUERY PLAN'
+    result = db.session.connection().exec_driver_sql(f'{prefix} {sql}', parameters)
+    columns = list(result.keys())
+    return columns, [list(row) for row in result]
+
+
+def render(columns, rows):
+    lines = ['| ' + ' | '.join(columns) + ' |', '|' + '---|' * len(columns)]
+    for row in rows:
+        lines.append('| ' + ' | '.join('' if v is None else str(v) for v in row) + ' |')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Before/after EXPLAIN for the hot queries (markdown on stdout)')
+    parser.add_argument('--seed', type=int, nargs='?', const=20000, default=0, metavar='N_TASKS',
+                        help='insert sample data (default 20000 tasks) when the tasks table is empty')
+    args = parser.parse_args()
+
+    # create_app in log ra stdout, chuyển sang stderr để stdout chỉ còn báo cáo
+    with contextlib.redirect_stdout(sys.stderr):
+        app = create_app()
+
+    with app.app_context():
+        from models.task import Task
+
+        if args.seed:
+            if db.session.query(Task.id).first() is not None:
+                sys.exit('❌ --seed only runs on an empty tasks table, use a scratch database')
+            seed_sample_data(args.seed)
+
+        ids = sample_ids()
+        if ids is None:
+            sys.exit('❌ Not enough data (admin, leader with group, employee with tasks, subtask), run with --seed')
+
+        dialect = db.engine.dialect.name
+        print(f'# EXPLAIN report ({dialect}, {db.session.query(Task.id).count()} tasks)\n')
+        print('Generated by `python explain_report.py`. SQL captured from the running endpoints.\n')
+        for name, source, table, indexes, match in hot_queries(ids):
+            sql, parameters = capture(app, source, table, match)
+            print(f'## {name}\n')
+            print(f"Index: {', '.join(f'`{index}`' for index in indexes)} on `{table}`\n")
+            print(f'```sql\n{sql}\n```\n')
+            for label, statement in (('Before', without_indexes(sql, table, indexes)), ('After', sql)):
+                columns, rows = explain(statement, parameters)
+                print(f'**{label}**\n\n{render(columns, rows)}\n')
+
+
+if __name__ == '__main__':
+    main()
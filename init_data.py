@@ -30,8 +30,9 @@ def init_default_data():
     
     with app.app_context():
         try:
-            # Tạo tất cả tables
-            db.create_all()
+            # Tạo tất cả tables (migration có version)
+            from utils.migrations import run_migrations
+            run_migrations()
             print("✅ Database tables created")
             
             # Tạo admin mặc định
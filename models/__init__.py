@@ -6,5 +6,8 @@ from .file import File
 from .report import Report
 from .notification import Notification
 from .join_request import JoinRequest
+from .task_tombstone import TaskTombstone
+from .scheduler_state import SchedulerState
+from .data_version import DataVersion
 
-__all__ = ['User', 'Task', 'File', 'Report', 'Group', 'Notification', 'JoinRequest']
\ No newline at end of file
+__all__ = ['User', 'Task', 'File', 'Report', 'Group', 'Notification', 'JoinRequest', 'TaskTombstone', 'SchedulerState', 'DataVersion']
\ No newline at end of file
@@ -0,0 +1,11 @@
+# models/data_version.py - Bộ đếm version theo phạm vi dữ liệu (tasks, users, groups) cho ETag
+from database import db
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+
+    scope = db.Column(db.String(32), primary_key=True)  # vd: tasks, users, groups
+    version = db.Column(db.BigInteger, nullable=False, default=0)  # Tăng 1 mỗi transaction có ghi
+
+    def __repr__(self):
+        return f'<DataVersion {self.scope} {self.version}>'
@@ -8,6 +8,7 @@ class Group(db.Model):
     description = db.Column(db.Text)
     leader_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     
     # Quan hệ
     leader = db.relationship('User', foreign_keys=[leader_id], backref='led_groups')
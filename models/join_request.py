@@ -29,6 +29,10 @@ class JoinRequest(db.Model):
     group = db.relationship('Group', backref='join_requests')
     processed_by = db.relationship('User', foreign_keys=[processed_by_id])
     
+    __table_args__ = (
+        db.Index('ix_join_requests_group_status', 'group_id', 'status'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -45,6 +45,15 @@ class Notification(db.Model):
     group = db.relationship('Group', backref='notifications')
     report = db.relationship('Report', backref='notifications')
     
+    __table_args__ = (
+        # Danh sách / đếm notifications chưa đọc của user
+        db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        # Job quét deadline kiểm tra "task đã được nhắc hôm nay chưa" (NOT EXISTS)
+        db.Index('ix_notifications_task_type_created', 'task_id', 'type', 'created_at'),
+        # Job dọn notifications xóa theo (type, created_at < mốc giữ lại) từng lô
+        db.Index('ix_notifications_type_created', 'type', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
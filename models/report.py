@@ -8,5 +8,9 @@ class Report(db.Model):
     file_path = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index('ix_reports_user_created', 'user_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Report week={self.week}>'
@@ -0,0 +1,27 @@
+# models/scheduler_state.py - Trạng thái bền của các job định kỳ (watermark lần quét cuối)
+from database import db
+
+class SchedulerState(db.Model):
+    __tablename__ = 'scheduler_state'
+
+    name = db.Column(db.String(64), primary_key=True)  # Tên job, vd: deadline_check
+    last_run_at = db.Column(db.DateTime, nullable=True)  # Mốc thời gian đã xử lý tới
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f'<SchedulerState {self.name} {self.last_run_at}>'
+
+
+def get_watermark(name):
+    """Mốc last_run_at của job, None nếu job chưa chạy lần nào"""
+    state = db.session.get(SchedulerState, name)
+    return state.last_run_at if state else None
+
+
+def set_watermark(name, value):
+    """Ghi mốc mới trong transaction hiện tại (commit cùng với kết quả của job)"""
+    state = db.session.get(SchedulerState, name)
+    if state is None:
+        db.session.add(SchedulerState(name=name, last_run_at=value))
+    else:
+        state.last_run_at = value
@@ -1,5 +1,8 @@
 # models/task.py - CẬP NHẬT
+from datetime import datetime
+from sqlalchemy import event
 from database import db
+from utils.week_calendar import week_key_for
 
 class Task(db.Model):
     __tablename__ = 'tasks'
@@ -12,6 +15,13 @@ class Task(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     
+    # Tuần ISO của created_at (vd: 2025-W28), gán khi insert để lọc theo tuần bằng so sánh bằng
+    week_key = db.Column(db.String(8), nullable=True)
+    
+    # Đếm sẵn subtasks trực tiếp, cập nhật khi tạo/sửa/xóa subtask (utils/subtask_counters.py)
+    subtasks_total = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    subtasks_done = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    
     # Foreign keys
     parent_task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=True)
     assigner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -23,5 +33,37 @@ class Task(db.Model):
     subtasks = db.relationship('Task', backref=db.backref('parent_task', remote_side=[id]), lazy=True)
     files = db.relationship('File', backref='task', lazy=True)
 
+    __table_args__ = (
+        # Index cho các query nóng (danh sách theo user, theo group, quét deadline, subtasks, delta-sync)
+        db.Index('ix_tasks_assignee_created', 'assignee_id', 'created_at'),
+        # Nhánh assigner_id của điều kiện xem task (assignee_id = :uid OR assigner_id = :uid)
+        db.Index('ix_tasks_assigner_created', 'assigner_id', 'created_at'),
+        db.Index('ix_tasks_group_status', 'group_id', 'status'),
+        db.Index('ix_tasks_deadline_status', 'deadline', 'status'),
+        db.Index('ix_tasks_parent', 'parent_task_id'),
+        db.Index('ix_tasks_week_assignee', 'week_key', 'assignee_id'),
+        db.Index('ix_tasks_updated', 'updated_at', 'id'),
+        # FULLTEXT cho search theo title + description (chỉ MySQL)
+        db.Index('ft_tasks_title_description', 'title', 'description', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
     def __repr__(self):
-        return f'<Task {self.title}>'
\ No newline at end of file
+        return f'<Task {self.title}>'
+
+def task_timestamp():
+    """created_at cho task tạo từ Python (ORM, bulk-create, import): luôn dùng UTC
+
+    Cùng đồng hồ với NOW() của MySQL (server chạy UTC, giá trị mặc định của cột) và các job
+    dùng datetime.utcnow(), để created_at / week_key không lệch nhau giữa các đường tạo task.
+    Bỏ phần micro giây: cột DATETIME của MySQL làm tròn (không cắt) nên 23:59:59.6 thành 00:00:00
+    của ngày/tuần sau, khác với week_key tính ở Python.
+    """
+    return datetime.utcnow().replace(microsecond=0)
+
+@event.listens_for(Task, 'before_insert')
+def set_week_key(mapper, connection, target):
+    """Gán week_key theo created_at; created_at được gán luôn để 2 cột khớp nhau"""
+    if target.created_at is None:
+        target.created_at = task_timestamp()
+    if target.week_key is None:
+        target.week_key = week_key_for(target.created_at)
@@ -0,0 +1,61 @@
+# models/task_tombstone.py - Ghi lại task đã xóa / chuyển người để client delta-sync xóa bản sao local
+from sqlalchemy import event, inspect
+from database import db
+from models.task import Task
+
+class TaskTombstone(db.Model):
+    __tablename__ = 'task_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)  # Không FK vì task đã bị xóa
+    # Phạm vi cũ của task, dùng để lọc theo quyền giống tasks
+    assignee_id = db.Column(db.Integer, nullable=True)
+    assigner_id = db.Column(db.Integer, nullable=True)
+    group_id = db.Column(db.Integer, nullable=True)
+    deleted_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_task_tombstones_deleted', 'deleted_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<TaskTombstone {self.task_id}>'
+
+
+def record_task_tombstones(connection, rows):
+    """Insert tombstone cho các dict {task_id, assignee_id, assigner_id, group_id} trong transaction hiện tại"""
+    if rows:
+        connection.execute(TaskTombstone.__table__.insert(), rows)
+
+
+def _old_value(target, attr):
+    history = inspect(target).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(target, attr)
+
+
+@event.listens_for(Task, 'after_delete')
+def tombstone_deleted_task(mapper, connection, target):
+    record_task_tombstones(connection, [{
+        'task_id': target.id,
+        'assignee_id': _old_value(target, 'assignee_id'),
+        'assigner_id': _old_value(target, 'assigner_id'),
+        'group_id': _old_value(target, 'group_id')
+    }])
+
+
+@event.listens_for(Task, 'after_update')
+def tombstone_reassigned_task(mapper, connection, target):
+    """Task đổi người có thể rời khỏi phạm vi của người cũ, ghi tombstone theo phạm vi cũ"""
+    state = inspect(target)
+    if not any(state.attrs[attr].history.has_changes() for attr in ('assignee_id', 'assigner_id', 'group_id')):
+        return
+    record_task_tombstones(connection, [{
+        'task_id': target.id,
+        'assignee_id': _old_value(target, 'assignee_id'),
+        'assigner_id': _old_value(target, 'assigner_id'),
+        'group_id': _old_value(target, 'group_id')
+    }])
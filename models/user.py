@@ -11,6 +11,7 @@ class User(db.Model):
     role = db.Column(db.Enum('employee', 'leader', 'admin'), default='employee', nullable=False)  # THÊM ADMIN
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=True)  # THÊM GROUP
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
     is_active = db.Column(db.Boolean, default=True)  # TRẠNG THÁI ACTIVE/INACTIVE
 
     # Quan hệ
@@ -6,6 +6,8 @@ from models.file import File
 from models.task import Task
 from models.user import User
 from config import Config
+from sqlalchemy.orm import joinedload
+from utils.streaming import get_stream_mode, stream_response
 
 file_bp = Blueprint('file', __name__)
 
@@ -219,17 +221,27 @@ def get_all_files():
         if not user or user.role not in ['admin', 'leader']:
             return jsonify({'message': 'Access denied. Only admins or leaders can view all files'}), 403
 
-    files = File.query.order_by(File.upload_date.desc()).all()
-    result = []
-    
-    for f in files:
-        uploader = User.query.get(f.uploaded_by)
-        task = Task.query.get(f.task_id)
-        
-        result.append({
+    try:
+        stream_mode = get_stream_mode(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # ✅ Task và uploader load cùng 1 query
+    query = File.query.options(
+        joinedload(File.task), joinedload(File.uploader)
+    ).order_by(File.upload_date.desc())
+    totals = {'total_files': 0, 'total_size': 0}
+
+    def serialize(f):
+        uploader = f.uploader
+        task = f.task
+        file_size = get_file_size(f.filepath)
+        totals['total_files'] += 1
+        totals['total_size'] += file_size
+        return {
             'id': f.id,
             'filename': f.filename,
-            'file_size': get_file_size(f.filepath),
+            'file_size': file_size,
             'task': {
                 'id': task.id,
                 'title': task.title,
@@ -241,12 +253,16 @@ def get_all_files():
                 'employee_code': uploader.employee_code
             } if uploader else None,
             'upload_date': f.upload_date.strftime('%Y-%m-%d %H:%M:%S') if f.upload_date else None
-        })
-    
+        }
+
+    # stream=json|ndjson: tổng số file / dung lượng được ghi sau mảng files
+    if stream_mode:
+        return stream_response(query, serialize, stream_mode, key='files', summary=lambda: totals)
+
+    result = [serialize(f) for f in query.all()]
     return jsonify({
         'files': result,
-        'total_files': len(result),
-        'total_size': sum([get_file_size(f.filepath) for f in files])
+        **totals
     })
 
 # Lấy files của 1 user
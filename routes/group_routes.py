@@ -3,9 +3,11 @@ from database import db
 from models.group import Group
 from models.user import User
 from models.task import Task
-from routes.notification_routes import create_notification, NotificationType
+from routes.notification_routes import NotificationType
+from utils.notifications import create_notifications
 from models.join_request import JoinRequest, JoinRequestStatus
 from datetime import datetime
+from utils.etag import list_etag, etag_matches, not_modified, with_etag, task_version, user_version, group_version
 
 group_bp = Blueprint('group', __name__)
 
@@ -82,6 +84,10 @@ def create_group():
 # Lấy danh sách tất cả nhóm
 @group_bp.route('/all', methods=['GET'])
 def get_all_groups():
+    etag = list_etag(*group_version(), *user_version(), *task_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+    
     groups = Group.query.all()
     result = []
     for group in groups:
@@ -104,7 +110,7 @@ def get_all_groups():
             'completion_rate': f"{(completed_tasks/group_tasks*100):.1f}%" if group_tasks > 0 else "0%",
             'created_at': group.created_at.strftime('%Y-%m-%d %H:%M:%S')
         })
-    return jsonify(result)
+    return with_etag(jsonify(result), etag)
 
 # Gán leader cho group (chỉ admin)
 @group_bp.route('/assign-leader', methods=['POST'])
@@ -262,27 +268,29 @@ def add_member_to_group():
     
     try:
         user.group_id = group_id
-        db.session.commit()
         
          # ✅ THÊM: Notification for user joining group
         group = Group.query.get(group_id)
-        create_notification(
-            user_id=user.id,
-            title=f"Added to group: {group.name}",
-            message=f"You have been added to the group '{group.name}'",
-            notification_type=NotificationType.GROUP_JOINED,
-            group_id=group_id
-        )
+        notifications = [(
+            user.id,
+            f"Added to group: {group.name}",
+            f"You have been added to the group '{group.name}'",
+            NotificationType.GROUP_JOINED,
+            {'group_id': group_id}
+        )]
         
         # ✅ Notify group leader
         if group.leader_id and group.leader_id != user.id:
-            create_notification(
-                user_id=group.leader_id,
-                title=f"New member joined: {group.name}",
-                message=f"{user.name} has joined your group '{group.name}'",
-                notification_type=NotificationType.GROUP_JOINED,
-                group_id=group_id
-            )
+            notifications.append((
+                group.leader_id,
+                f"New member joined: {group.name}",
+                f"{user.name} has joined your group '{group.name}'",
+                NotificationType.GROUP_JOINED,
+                {'group_id': group_id}
+            ))
+        create_notifications(notifications, defer=True)
+        
+        db.session.commit()
         
         return jsonify({'message': f'User {user.name} added to group {group.name} successfully'})
     except Exception as e:
@@ -389,16 +397,16 @@ def remove_member_from_group():
         # Nếu user đang là leader, set group leader thành None
         if is_leader:
             group.leader_id = None
-            
-        db.session.commit()
         
-        create_notification(
-            user_id=user.id,
-            title=f"Removed from group: {old_group.name}",
-            message=f"You have been removed from the group '{old_group.name}'",
-            notification_type=NotificationType.GROUP_REMOVED,
-            group_id=old_group.id
-        )
+        create_notifications([(
+            user.id,
+            f"Removed from group: {old_group.name}",
+            f"You have been removed from the group '{old_group.name}'",
+            NotificationType.GROUP_REMOVED,
+            {'group_id': old_group.id}
+        )], defer=True)
+        
+        db.session.commit()
         
         message = f'User {user.name} removed from group {group.name} successfully'
         if is_leader:
@@ -700,33 +708,32 @@ def create_join_request():
         )
         
         db.session.add(join_request)
-        db.session.commit()
         
-        # ✅ Gửi notification cho admin và leader
+        # ✅ Gửi notification cho admin và leader (1 INSERT, commit cùng join request)
         # Notification cho admin
-        admins = User.query.filter_by(role='admin').all()
-        for admin in admins:
-            create_notification(
-                user_id=admin.id,
-                title=f"New join request: {group.name}",
-                message=f"{user.name} ({user.employee_code}) wants to join group '{group.name}'",
-                notification_type=NotificationType.GROUP_JOIN_REQUEST,
-                group_id=group_id,
-                is_important=True
-            )
+        admin_ids = [admin_id for (admin_id,) in db.session.query(User.id).filter_by(role='admin')]
+        notifications = [(
+            admin_id,
+            f"New join request: {group.name}",
+            f"{user.name} ({user.employee_code}) wants to join group '{group.name}'",
+            NotificationType.GROUP_JOIN_REQUEST,
+            {'group_id': group_id, 'is_important': True}
+        ) for admin_id in admin_ids]
         
         # Notification cho leader của group (nếu khác admin)
         if group.leader_id:
             leader = User.query.get(group.leader_id)
             if leader and leader.role != 'admin':
-                create_notification(
-                    user_id=leader.id,
-                    title=f"New join request: {group.name}",
-                    message=f"{user.name} ({user.employee_code}) wants to join your group '{group.name}'",
-                    notification_type=NotificationType.GROUP_JOIN_REQUEST,
-                    group_id=group_id,
-                    is_important=True
-                )
+                notifications.append((
+                    leader.id,
+                    f"New join request: {group.name}",
+                    f"{user.name} ({user.employee_code}) wants to join your group '{group.name}'",
+                    NotificationType.GROUP_JOIN_REQUEST,
+                    {'group_id': group_id, 'is_important': True}
+                ))
+        create_notifications(notifications, defer=True)
+        
+        db.session.commit()
         
         return jsonify({
             'message': 'Join request submitted successfully',
@@ -813,17 +820,16 @@ def approve_join_request(request_id):
         # Add user to group
         user.group_id = join_request.group_id
         
-        db.session.commit()
-        
         # ✅ Gửi notification cho user
-        create_notification(
-            user_id=user.id,
-            title=f"Join request approved: {join_request.group.name}",
-            message=f"Your request to join '{join_request.group.name}' has been approved by {admin.name}",
-            notification_type=NotificationType.GROUP_JOINED,
-            group_id=join_request.group_id,
-            is_important=True
-        )
+        create_notifications([(
+            user.id,
+            f"Join request approved: {join_request.group.name}",
+            f"Your request to join '{join_request.group.name}' has been approved by {admin.name}",
+            NotificationType.GROUP_JOINED,
+            {'group_id': join_request.group_id, 'is_important': True}
+        )], defer=True)
+        
+        db.session.commit()
         
         return jsonify({
             'message': 'Join request approved successfully',
@@ -865,17 +871,16 @@ def reject_join_request(request_id):
         join_request.processed_by_id = admin_id
         join_request.processed_at = datetime.utcnow()
         
-        db.session.commit()
-        
         # ✅ Gửi notification cho user
-        create_notification(
-            user_id=join_request.user_id,
-            title=f"Join request rejected: {join_request.group.name}",
-            message=f"Your request to join '{join_request.group.name}' has been rejected by {admin.name}",
-            notification_type=NotificationType.GROUP_JOIN_REJECTED,
-            group_id=join_request.group_id,
-            is_important=True
-        )
+        create_notifications([(
+            join_request.user_id,
+            f"Join request rejected: {join_request.group.name}",
+            f"Your request to join '{join_request.group.name}' has been rejected by {admin.name}",
+            NotificationType.GROUP_JOIN_REJECTED,
+            {'group_id': join_request.group_id, 'is_important': True}
+        )], defer=True)
+        
+        db.session.commit()
         
         return jsonify({
             'message': 'Join request rejected',
@@ -6,6 +6,7 @@ from models.group import Group
 from models.report import Report
 from database import db
 from datetime import datetime, timedelta
+from utils.etag import list_etag, etag_matches, not_modified, with_etag, notification_version
 
 notification_bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
@@ -20,6 +21,11 @@ def get_notifications():
     if not user_id:
         return jsonify({'message': 'Missing user_id'}), 400
     
+    # Poll liên tục: không có notification mới / đổi trạng thái đọc thì trả 304
+    etag = list_etag(*notification_version(user_id))
+    if etag_matches(etag):
+        return not_modified(etag)
+    
     query = Notification.query.filter_by(user_id=user_id)
     
     if unread_only:
@@ -28,11 +34,11 @@ def get_notifications():
     total = query.count()
     notifications = query.order_by(Notification.created_at.desc()).offset(offset).limit(limit).all()
     
-    return jsonify({
+    return with_etag(jsonify({
         'notifications': [n.to_dict() for n in notifications],
         'total': total,
         'unread_count': Notification.query.filter_by(user_id=user_id, is_read=False).count()
-    })
+    }), etag)
 
 @notification_bp.route('/mark-read/<int:notification_id>', methods=['PUT'])
 def mark_as_read(notification_id):
@@ -93,7 +99,11 @@ def clear_all_notifications():
 
 # ✅ Utility function để tạo notifications
 def create_notification(user_id, title, message, notification_type, **kwargs):
-    """Helper function để tạo notification mới"""
+    """Helper function để tạo notification mới (commit riêng)
+
+    Gửi cho nhiều người hoặc cần ghi cùng transaction với dữ liệu vừa sửa thì dùng
+    create_notifications (utils/notifications.py).
+    """
     notification = Notification(
         user_id=user_id,
         title=title,
@@ -14,7 +14,11 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 import re
-from routes.notification_routes import create_notification, NotificationType
+from routes.notification_routes import NotificationType
+from utils.notifications import create_notifications
+from utils.week_calendar import normalize_week, week_range
+from utils.visibility import group_member_ids, filter_visible_reports
+from utils.etag import list_etag, etag_matches, not_modified, with_etag, report_version, user_version
 
 report_bp = Blueprint('report', __name__)
 
@@ -36,21 +40,14 @@ def generate_weekly_report():
 
         # Parse week to get date range
         try:
-            year, week_num = week.split('-W')
-            year = int(year)
-            week_num = int(week_num)
-            
-            jan1 = datetime(year, 1, 1)
-            start_date = jan1 + timedelta(weeks=week_num-1) - timedelta(days=jan1.weekday())
-            end_date = start_date + timedelta(days=6)
+            week_key = normalize_week(week)
         except ValueError:
             return jsonify({'message': 'Invalid week format. Use YYYY-WXX'}), 400
 
         # Get tasks for the week
         tasks = Task.query.filter(
             Task.assignee_id == user_id,
-            Task.created_at >= start_date,
-            Task.created_at <= end_date + timedelta(days=1)
+            Task.week_key == week_key
         ).all()
 
         # ✅ Tạo báo cáo ngay cả khi không có tasks
@@ -123,15 +120,16 @@ def generate_weekly_report():
             file_path=file_path
         )
         db.session.add(new_report)
-        db.session.commit()
+        db.session.flush()  # Cần new_report.id cho notification
         
-        create_notification(
-            user_id=user_id,
-            title="Weekly report generated",
-            message=f"Your weekly report for {week} has been generated successfully",
-            notification_type=NotificationType.REPORT_GENERATED,
-            report_id=new_report.id
-        )
+        create_notifications([(
+            user_id,
+            "Weekly report generated",
+            f"Your weekly report for {week} has been generated successfully",
+            NotificationType.REPORT_GENERATED,
+            {'report_id': new_report.id}
+        )], defer=True)
+        db.session.commit()
 
         return jsonify({
             'message': 'Weekly report generated successfully',
@@ -166,21 +164,14 @@ def generate_weekly_report_pdf():
 
         # Parse week
         try:
-            year, week_num = week.split('-W')
-            year = int(year)
-            week_num = int(week_num)
-            
-            jan1 = datetime(year, 1, 1)
-            start_date = jan1 + timedelta(weeks=week_num-1) - timedelta(days=jan1.weekday())
-            end_date = start_date + timedelta(days=6)
+            week_key = normalize_week(week)
         except ValueError:
             return jsonify({'message': 'Invalid week format'}), 400
 
         # Get tasks
         tasks = Task.query.filter(
             Task.assignee_id == user_id,
-            Task.created_at >= start_date,
-            Task.created_at <= end_date + timedelta(days=1)
+            Task.week_key == week_key
         ).all()
 
         # Create reports folder
@@ -262,15 +253,16 @@ def generate_weekly_report_pdf():
             file_path=file_path
         )
         db.session.add(new_report)
-        db.session.commit()
+        db.session.flush()  # Cần new_report.id cho notification
         
-        create_notification(
-            user_id=user_id,
-            title="Weekly report generated",
-            message=f"Your weekly report for {week} has been generated successfully",
-            notification_type=NotificationType.REPORT_GENERATED,
-            report_id=new_report.id
-        )
+        create_notifications([(
+            user_id,
+            "Weekly report generated",
+            f"Your weekly report for {week} has been generated successfully",
+            NotificationType.REPORT_GENERATED,
+            {'report_id': new_report.id}
+        )], defer=True)
+        db.session.commit()
 
         return jsonify({
             'message': 'PDF report generated successfully',
@@ -306,20 +298,13 @@ def generate_summary_report():
 
         # Parse week
         try:
-            year, week_num = week.split('-W')
-            year = int(year)
-            week_num = int(week_num)
-            
-            jan1 = datetime(year, 1, 1)
-            start_date = jan1 + timedelta(weeks=week_num-1) - timedelta(days=jan1.weekday())
-            end_date = start_date + timedelta(days=6)
+            week_key = normalize_week(week)
         except ValueError:
             return jsonify({'message': 'Invalid week format'}), 400
 
         # ✅ Build query based on role - SỬA LẠI LOGIC
         query = Task.query.filter(
-            Task.created_at >= start_date,
-            Task.created_at <= end_date + timedelta(days=1)
+            Task.week_key == week_key
         )
 
         if admin.role == 'leader':
@@ -329,14 +314,8 @@ def generate_summary_report():
                 tasks = []
                 report_scope = f"Leader {admin.name} (No group assigned)"
             else:
-                # Lấy tất cả users trong nhóm của leader
-                group_users = User.query.filter_by(group_id=admin.group_id).all()
-                if group_users:
-                    user_ids = [u.id for u in group_users]
-                    query = query.filter(Task.assignee_id.in_(user_ids))
-                    tasks = query.all()
-                else:
-                    tasks = []
+                # Tasks assign cho users trong nhóm của leader (subquery, không load danh sách user)
+                tasks = query.filter(Task.assignee_id.in_(group_member_ids(admin.group_id))).all()
                 
                 group = Group.query.get(admin.group_id)
                 group_name = group.name if group else f"Group {admin.group_id}"
@@ -349,13 +328,7 @@ def generate_summary_report():
                 if not group:
                     return jsonify({'message': 'Group not found'}), 404
                 
-                group_users = User.query.filter_by(group_id=group_id).all()
-                if group_users:
-                    user_ids = [u.id for u in group_users]
-                    query = query.filter(Task.assignee_id.in_(user_ids))
-                    tasks = query.all()
-                else:
-                    tasks = []
+                tasks = query.filter(Task.assignee_id.in_(group_member_ids(group_id))).all()
                 
                 report_scope = f"Group: {group.name}"
             else:
@@ -411,6 +384,7 @@ def generate_summary_report():
         completed = len([t for t in tasks if t.status == 'done']) if tasks else 0
         in_progress = len([t for t in tasks if t.status == 'doing']) if tasks else 0
         todo = len([t for t in tasks if t.status == 'todo']) if tasks else 0
+        start_date, next_week_start = week_range(week_key)
 
         stats_data = [
             ['Total Tasks', total_tasks],
@@ -420,7 +394,7 @@ def generate_summary_report():
             ['Completion Rate', f"{(completed/total_tasks*100):.1f}%" if total_tasks > 0 else "0%"],
             ['Report Scope', report_scope],
             ['Generated By', f"{admin.name} ({admin.role})"],
-            ['Week Period', f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"]
+            ['Week Period', f"{start_date.strftime('%Y-%m-%d')} to {(next_week_start - timedelta(days=1)).strftime('%Y-%m-%d')}"]
         ]
 
         # Create Excel file
@@ -511,20 +485,13 @@ def generate_summary_report_pdf():
 
         # Parse week
         try:
-            year, week_num = week.split('-W')
-            year = int(year)
-            week_num = int(week_num)
-            
-            jan1 = datetime(year, 1, 1)
-            start_date = jan1 + timedelta(weeks=week_num-1) - timedelta(days=jan1.weekday())
-            end_date = start_date + timedelta(days=6)
+            week_key = normalize_week(week)
         except ValueError:
             return jsonify({'message': 'Invalid week format'}), 400
 
         # ✅ Get tasks based on role - logic giống Excel
         query = Task.query.filter(
-            Task.created_at >= start_date,
-            Task.created_at <= end_date + timedelta(days=1)
+            Task.week_key == week_key
         )
 
         if admin.role == 'leader':
@@ -532,13 +499,7 @@ def generate_summary_report_pdf():
                 tasks = []
                 report_scope = f"Leader {admin.name} (No group assigned)"
             else:
-                group_users = User.query.filter_by(group_id=admin.group_id).all()
-                if group_users:
-                    user_ids = [u.id for u in group_users]
-                    query = query.filter(Task.assignee_id.in_(user_ids))
-                    tasks = query.all()
-                else:
-                    tasks = []
+                tasks = query.filter(Task.assignee_id.in_(group_member_ids(admin.group_id))).all()
                 
                 group = Group.query.get(admin.group_id)
                 group_name = group.name if group else f"Group {admin.group_id}"
@@ -550,13 +511,7 @@ def generate_summary_report_pdf():
                 if not group:
                     return jsonify({'message': 'Group not found'}), 404
                 
-                group_users = User.query.filter_by(group_id=group_id).all()
-                if group_users:
-                    user_ids = [u.id for u in group_users]
-                    query = query.filter(Task.assignee_id.in_(user_ids))
-                    tasks = query.all()
-                else:
-                    tasks = []
+                tasks = query.filter(Task.assignee_id.in_(group_member_ids(group_id))).all()
                 
                 report_scope = f"Group: {group.name}"
             else:
@@ -691,22 +646,17 @@ def get_reports():
     if not user_id:
         return jsonify({'message': 'Missing user_id'}), 400
 
+    # Danh sách phụ thuộc reports + users (người tạo, thành viên nhóm)
+    etag = list_etag(*report_version(), *user_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+
     user = User.query.get(user_id)
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
     # Build query based on role
-    if user.role == 'employee':
-        reports = Report.query.filter_by(user_id=user_id).order_by(Report.created_at.desc()).all()
-    elif user.role == 'leader':
-        if user.group_id:
-            group_users = User.query.filter_by(group_id=user.group_id).all()
-            user_ids = [u.id for u in group_users]
-            reports = Report.query.filter(Report.user_id.in_(user_ids)).order_by(Report.created_at.desc()).all()
-        else:
-            reports = Report.query.filter_by(user_id=user_id).order_by(Report.created_at.desc()).all()
-    else:  # admin
-        reports = Report.query.order_by(Report.created_at.desc()).all()
+    reports = filter_visible_reports(Report.query, user).order_by(Report.created_at.desc()).all()
 
     result = []
     for report in reports:
@@ -743,7 +693,7 @@ def get_reports():
             'created_at': report.created_at.strftime('%Y-%m-%d %H:%M:%S')
         })
 
-    return jsonify(result)
+    return with_etag(jsonify(result), etag)
 
 # 6. Download report
 @report_bp.route('/download/<int:report_id>', methods=['GET'])
@@ -813,28 +763,19 @@ def get_statistics():
     if not user:
         return jsonify({'message': 'User not found'}), 404
     
-    # Build query based on role
-    if user.role == 'employee':
-        reports = Report.query.filter_by(user_id=user_id).all()
-    elif user.role == 'leader':
-        if user.group_id:
-            group_users = User.query.filter_by(group_id=user.group_id).all()
-            user_ids = [u.id for u in group_users]
-            reports = Report.query.filter(Report.user_id.in_(user_ids)).all()
-        else:
-            reports = Report.query.filter_by(user_id=user_id).all()
-    else:  # admin
-        reports = Report.query.all()
-    
-    # Calculate statistics
-    total = len(reports)
-    
-    now = datetime.now()
+    # created_at của report là NOW() của DB (UTC)
+    now = datetime.utcnow()
     start_of_week = now - timedelta(days=now.weekday())
-    this_week = len([r for r in reports if r.created_at >= start_of_week])
-    
     start_of_month = now.replace(day=1)
-    this_month = len([r for r in reports if r.created_at >= start_of_month])
+
+    # ✅ Lọc theo role và đếm trong cùng 1 query, không load từng report
+    def count_since(start):
+        return db.func.coalesce(db.func.sum(db.case((Report.created_at >= start, 1), else_=0)), 0)
+
+    total, this_week, this_month = filter_visible_reports(
+        db.session.query(db.func.count(Report.id), count_since(start_of_week), count_since(start_of_month)),
+        user
+    ).one()
     
     # ✅ XÓA downloads count
     return jsonify({
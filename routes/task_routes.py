@@ -1,13 +1,107 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from database import db
-from models.task import Task
+from models.task import Task, task_timestamp
 from models.user import User
 from models.group import Group
+from models.task_tombstone import TaskTombstone, record_task_tombstones
 from datetime import datetime, timedelta
-from routes.notification_routes import create_notification, NotificationType
+import time
+from sqlalchemy.orm import joinedload, defer
+from routes.notification_routes import NotificationType
+from utils.notifications import create_notifications
+from utils.pagination import wants_pagination, parse_page_args, keyset_paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.task_progress import get_progress_map, progress_from_counts, MAX_TREE_DEPTH
+from utils.cache import TTLCache
+from utils.week_calendar import normalize_week, week_key_for
+from utils.task_tree import fetch_subtree_rows, build_task_tree, DEFAULT_TREE_DEPTH
+from utils.task_search import search_tasks_ranked, encode_offset_cursor, decode_offset_cursor, queue_index_upsert
+from utils.bulk_insert import bulk_insert
+from utils.subtask_counters import apply_subtask_deltas
+from utils.etag import list_etag, etag_matches, not_modified, with_etag, task_version, user_version, group_version
+from utils.streaming import get_stream_mode, stream_response
+from utils.task_fields import TaskFields, TASK_RELATIONSHIPS, parse_task_fields
+from utils.visibility import filter_visible_tasks
+from utils.deadline_timers import queue_deadline_refresh
+from utils.parent_options import parent_options_cache, parent_options_key, queue_parent_options_invalidation
+from utils.task_import import detect_import_format, iter_import_records, validate_import_record, ImportLookups
+from utils.task_sync import fetch_task_changes, decode_sync_cursor, tombstone_cutoff, SYNC_PAGE_SIZE, MAX_SYNC_PAGE_SIZE
 
 task_bp = Blueprint('task', __name__)
 
+# Cache thống kê dashboard, TTL lấy từ config DASHBOARD_CACHE_TTL
+dashboard_cache = TTLCache(maxsize=1024)
+
+# Số task tối đa cho 1 request PATCH /batch
+MAX_BATCH_UPDATE = 1000
+
+# Giới hạn batch_size khi import, và số lỗi trả về chi tiết trong báo cáo import
+MAX_IMPORT_BATCH_SIZE = 5000
+MAX_IMPORT_ERRORS = 1000
+
+def fetch_tasks(query):
+    """Lấy tasks theo created_at desc, phân trang theo cursor nếu client yêu cầu
+
+    Trả về (tasks, page_info); page_info là None khi không phân trang.
+    Raise ValueError nếu limit/cursor/total không hợp lệ.
+    """
+    if not wants_pagination(request.args):
+        return query.order_by(Task.created_at.desc()).all(), None
+    limit, position, total = parse_page_args(request.args)
+    return keyset_paginate(query, Task, limit, position, total)
+
+def list_response(result, page_info):
+    """Trả về list như cũ, hoặc {'tasks': [...], next_cursor, ...} khi phân trang"""
+    if page_info is None:
+        return jsonify(result)
+    return jsonify({'tasks': result, **page_info})
+
+def format_task_item(task, progress, selection=None):
+    """Task dạng item của /all (các object được embed phải load sẵn bằng joinedload)"""
+    selection = selection or TaskFields()
+
+    item = {
+        'id': task.id,
+        'title': task.title,
+        'status': task.status,
+        'priority': getattr(task, 'priority', 'medium'),
+        'deadline': task.deadline.strftime('%Y-%m-%d %H:%M:%S') if task.deadline else None,
+        'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else None,
+        'subtasks_count': task.subtasks_total,
+        'progress': progress
+    }
+    # Chỉ đọc description / object lồng nhau khi được yêu cầu để không phát sinh lazy load
+    if selection.wants('description'):
+        item['description'] = task.description
+    if selection.wants('assigner'):
+        assigner = task.assigner
+        item['assigner'] = {
+            'id': assigner.id,
+            'name': assigner.name,
+            'employee_code': assigner.employee_code
+        } if assigner else None
+    if selection.wants('assignee'):
+        assignee = task.assignee
+        item['assignee'] = {
+            'id': assignee.id,
+            'name': assignee.name,
+            'employee_code': assignee.employee_code,
+            'role': assignee.role
+        } if assignee else None
+    if selection.wants('group'):
+        group = task.group
+        item['group'] = {
+            'id': group.id,
+            'name': group.name
+        } if group else None
+    if selection.wants('parent_task'):
+        parent_task = task.parent_task
+        item['parent_task'] = {
+            'id': parent_task.id,
+            'title': parent_task.title
+        } if parent_task else None
+    return selection.pick(item)
+
 # Thêm task mới
 @task_bp.route('/create', methods=['POST'])
 def create_task():
@@ -77,18 +171,19 @@ def create_task():
     
     try:
         db.session.add(new_task)
-        db.session.commit()
         
         if assignee_id and assignee_id != assigner_id:
+            db.session.flush()  # Cần new_task.id cho notification
             assigner = User.query.get(assigner_id)
-            create_notification(
-                user_id=assignee_id,
-                title=f"New task assigned: {title}",
-                message=f"You have been assigned a new task '{title}' by {assigner.name if assigner else 'System'}",
-                notification_type=NotificationType.TASK_ASSIGNED,
-                task_id=new_task.id,
-                is_important=priority == 'high'
-            )
+            create_notifications([(
+                assignee_id,
+                f"New task assigned: {title}",
+                f"You have been assigned a new task '{title}' by {assigner.name if assigner else 'System'}",
+                NotificationType.TASK_ASSIGNED,
+                {'task_id': new_task.id, 'is_important': priority == 'high'}
+            )], defer=True)
+        
+        db.session.commit()
         
         return jsonify({
             'message': 'Task created successfully',
@@ -118,6 +213,8 @@ def search_tasks():
     date_to = request.args.get('date_to')     # YYYY-MM-DD
     week = request.args.get('week')           # YYYY-WXX
     title = request.args.get('title')
+    q = request.args.get('q')                 # Full-text trên title + description
+    prefix = request.args.get('prefix', 'true').lower() != 'false'
     
     # Tạo query cơ bản
     query = Task.query
@@ -151,63 +248,96 @@ def search_tasks():
         except ValueError:
             return jsonify({'message': 'Invalid date_to format. Use YYYY-MM-DD'}), 400
     
-    # Lọc theo tuần
+    # Lọc theo tuần (tuần ISO, so sánh bằng trên cột week_key đã có index)
     if week:
         try:
-            year, week_num = week.split('-W')
-            year = int(year)
-            week_num = int(week_num)
-            
-            # Tính toán ngày bắt đầu và kết thúc tuần
-            jan1 = datetime(year, 1, 1)
-            start_date = jan1 + timedelta(weeks=week_num-1) - timedelta(days=jan1.weekday())
-            end_date = start_date + timedelta(days=6)
-            
-            query = query.filter(
-                Task.created_at >= start_date,
-                Task.created_at <= end_date + timedelta(days=1)
-            )
+            query = query.filter(Task.week_key == normalize_week(week))
         except ValueError:
             return jsonify({'message': 'Invalid week format. Use YYYY-WXX (e.g., 2025-W28)'}), 400
     
+    try:
+        selection = parse_task_fields(request.args, ('assigner', 'assignee', 'group'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
     # Thực hiện query
-    tasks = query.order_by(Task.created_at.desc()).all()
+    scores = {}
+    if q:
+        # ✅ Full-text mode: các filter ở trên là pre-filter, kết quả xếp theo độ liên quan
+        try:
+            limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+            cursor = request.args.get('cursor')
+            offset = decode_offset_cursor(cursor) if cursor else 0
+        except ValueError:
+            return jsonify({'message': 'Invalid limit or cursor'}), 400
+        
+        ranked, has_more, total = search_tasks_ranked(
+            query, q, prefix=prefix, offset=offset, limit=limit,
+            with_total=request.args.get('total') in ('exact', 'estimate')
+        )
+        scores = dict(ranked)
+        loaded = {
+            task.id: task for task in Task.query.options(
+                *selection.query_options()
+            ).filter(Task.id.in_(list(scores))).all()
+        } if scores else {}
+        tasks = [loaded[task_id] for task_id, _ in ranked if task_id in loaded]
+        page_info = {
+            'limit': limit,
+            'next_cursor': encode_offset_cursor(offset + limit) if has_more else None,
+            'has_more': has_more
+        }
+        if total is not None:
+            page_info['total_count'] = total
+            page_info['total_is_estimate'] = False
+    else:
+        query = query.options(*selection.query_options())
+        try:
+            tasks, page_info = fetch_tasks(query)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
     result = []
     
     for task in tasks:
-        # Lấy thông tin liên quan
-        assigner = User.query.get(task.assigner_id) if task.assigner_id else None
-        assignee = User.query.get(task.assignee_id) if task.assignee_id else None
-        group = Group.query.get(task.group_id) if task.group_id else None
-        
-        result.append({
+        item = {
             'id': task.id,
             'title': task.title,
-            'description': task.description,
             'status': task.status,
             'priority': task.priority,
             'deadline': task.deadline.strftime('%Y-%m-%d %H:%M:%S') if task.deadline else None,
             'parent_task_id': task.parent_task_id,
-            'assigner': {
+            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None,
+            'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else None
+        }
+        # Lấy thông tin liên quan (chỉ những gì được yêu cầu)
+        if selection.wants('description'):
+            item['description'] = task.description
+        if selection.wants('assigner'):
+            assigner = task.assigner
+            item['assigner'] = {
                 'id': assigner.id,
                 'name': assigner.name,
                 'email': assigner.email
-            } if assigner else None,
-            'assignee': {
+            } if assigner else None
+        if selection.wants('assignee'):
+            assignee = task.assignee
+            item['assignee'] = {
                 'id': assignee.id,
                 'name': assignee.name,
                 'email': assignee.email,
                 'employee_code': assignee.employee_code
-            } if assignee else None,
-            'group': {
+            } if assignee else None
+        if selection.wants('group'):
+            group = task.group
+            item['group'] = {
                 'id': group.id,
                 'name': group.name
-            } if group else None,
-            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None,
-            'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else None
-        })
+            } if group else None
+        if q:
+            item['score'] = round(scores.get(task.id, 0), 4)
+        result.append(selection.pick(item))
     
-    return jsonify({
+    response = {
         'tasks': result,
         'total_count': len(result),
         'filters_applied': {
@@ -219,42 +349,61 @@ def search_tasks():
             'date_from': date_from,
             'date_to': date_to,
             'week': week,
-            'title': title
+            'title': title,
+            'q': q
         }
-    })
+    }
+    if page_info is not None:
+        # total_count chỉ có khi client gửi total=exact|estimate
+        response.update(page_info)
+        response['total_count'] = page_info.get('total_count')
+    
+    return jsonify(response)
 
 # Lấy danh sách task của 1 user
 @task_bp.route('/user/<int:user_id>', methods=['GET'])
 def get_tasks_by_user(user_id):
+    etag = list_etag(*task_version(), *user_version(), *group_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+
     user = User.query.get(user_id)
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
-    tasks = Task.query.filter_by(assignee_id=user_id).order_by(Task.created_at.desc()).all()
+    try:
+        selection = parse_task_fields(request.args, ('assigner', 'group'))
+        query = Task.query.filter_by(assignee_id=user_id).options(*selection.query_options())
+        tasks, page_info = fetch_tasks(query)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     result = []
     for task in tasks:
-        assigner = User.query.get(task.assigner_id) if task.assigner_id else None
-        group = Group.query.get(task.group_id) if task.group_id else None
-        
-        result.append({
+        item = {
             'id': task.id,
             'title': task.title,
-            'description': task.description,
             'status': task.status,
             'priority': task.priority,
             'deadline': task.deadline.strftime('%Y-%m-%d %H:%M:%S') if task.deadline else None,
             'parent_task_id': task.parent_task_id,
-            'assigner': {
+            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None
+        }
+        if selection.wants('description'):
+            item['description'] = task.description
+        if selection.wants('assigner'):
+            assigner = task.assigner
+            item['assigner'] = {
                 'id': assigner.id,
                 'name': assigner.name
-            } if assigner else None,
-            'group': {
+            } if assigner else None
+        if selection.wants('group'):
+            group = task.group
+            item['group'] = {
                 'id': group.id,
                 'name': group.name
-            } if group else None,
-            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None
-        })
-    return jsonify(result)
+            } if group else None
+        result.append(selection.pick(item))
+    return with_etag(list_response(result, page_info), etag)
 
 # Lấy tất cả tasks
 @task_bp.route('/all', methods=['GET'])
@@ -262,149 +411,157 @@ def get_all_tasks():
     """Lấy tất cả tasks theo quyền user"""
     # Lấy user_id từ query params để xác định quyền
     user_id = request.args.get('user_id')
+    # progress=deep: tính progress theo toàn bộ cây subtasks (mọi cấp)
+    deep_progress = request.args.get('progress') == 'deep'
     
     if not user_id:
         return jsonify({'message': 'Missing user_id parameter'}), 400
     
+    # ✅ Không có gì thay đổi thì trả 304 chỉ với 1 query
+    etag = list_etag(*task_version(), *user_version(), *group_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+    
     user = User.query.get(user_id)
     if not user:
         return jsonify({'message': 'User not found'}), 404
     
-    # Base query
-    query = Task.query
-    
     # ✅ Apply role-based filtering
-    if user.role == 'admin':
-        # Admin xem tất cả tasks
-        tasks = query.order_by(Task.created_at.desc()).all()
-        
-    elif user.role == 'leader':
-        # ✅ Leader chỉ xem tasks trong nhóm của mình + tasks của chính mình
-        if user.group_id:
-            # Lấy tất cả user IDs trong nhóm (bao gồm cả leader)
-            group_users = User.query.filter_by(group_id=user.group_id).all()
-            user_ids = [u.id for u in group_users]
-            
-            # Lấy tasks được assign cho members trong nhóm HOẶC tasks mà leader tạo
-            tasks = query.filter(
-                db.or_(
-                    Task.assignee_id.in_(user_ids),  # Tasks assigned to group members
-                    Task.assigner_id == user.id      # Tasks created by leader
-                )
-            ).order_by(Task.created_at.desc()).all()
-        else:
-            # Leader không có nhóm chỉ xem tasks của chính mình
-            tasks = query.filter(
-                db.or_(
-                    Task.assignee_id == user.id,
-                    Task.assigner_id == user.id
-                )
-            ).order_by(Task.created_at.desc()).all()
-            
-    else:  # employee
-        # Employee chỉ xem tasks của chính mình
-        tasks = query.filter(
-            db.or_(
-                Task.assignee_id == user.id,
-                Task.assigner_id == user.id
-            )
-        ).order_by(Task.created_at.desc()).all()
-
-    # Format response
-    result = []
-    for task in tasks:
-        # Lấy thông tin liên quan
-        assigner = User.query.get(task.assigner_id) if task.assigner_id else None
-        assignee = User.query.get(task.assignee_id) if task.assignee_id else None
-        group = Group.query.get(task.group_id) if task.group_id else None
-        parent_task = Task.query.get(task.parent_task_id) if task.parent_task_id else None
-        
-        # Count subtasks
-        subtasks_count = Task.query.filter_by(parent_task_id=task.id).count()
-        
-        result.append({
-            'id': task.id,
-            'title': task.title,
-            'description': task.description,
-            'status': task.status,
-            'priority': getattr(task, 'priority', 'medium'),
-            'deadline': task.deadline.strftime('%Y-%m-%d %H:%M:%S') if task.deadline else None,
-            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else None,
-            'assigner': {
-                'id': assigner.id,
-                'name': assigner.name,
-                'employee_code': assigner.employee_code
-            } if assigner else None,
-            'assignee': {
-                'id': assignee.id,
-                'name': assignee.name,
-                'employee_code': assignee.employee_code,
-                'role': assignee.role
-            } if assignee else None,
-            'group': {
-                'id': group.id,
-                'name': group.name
-            } if group else None,
-            'parent_task': {
-                'id': parent_task.id,
-                'title': parent_task.title
-            } if parent_task else None,
-            'subtasks_count': subtasks_count,
-            'progress': calculate_task_progress(task)
-        })
+    query = filter_visible_tasks(Task.query, user)
+
+    # ✅ Load assigner/assignee/group/parent cùng 1 query thay vì query.get() cho từng task,
+    # chỉ join các object có trong embed= / fields=
+    try:
+        selection = parse_task_fields(request.args, TASK_RELATIONSHIPS)
+        stream_mode = get_stream_mode(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    query = query.options(*selection.query_options())
     
-    return jsonify(result)
+    # ✅ stream=json|ndjson: đọc bằng server-side cursor, progress lấy từ counter trên từng dòng
+    if stream_mode:
+        if deep_progress:
+            return jsonify({'message': 'progress=deep is not available in stream mode'}), 400
+        wants_progress = selection.wants('progress')
+        return with_etag(stream_response(
+            query.order_by(Task.created_at.desc()),
+            lambda task: format_task_item(
+                task,
+                progress_from_counts(task.status, task.subtasks_total, task.subtasks_done) if wants_progress else None,
+                selection
+            ),
+            stream_mode
+        ), etag)
+    
+    try:
+        tasks, page_info = fetch_tasks(query)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # ✅ Progress cho cả trang từ counter subtasks_total/subtasks_done, không đọc bảng con
+    progress_map = get_progress_map(tasks, deep=deep_progress) if selection.wants('progress') else {}
+
+    result = [format_task_item(task, progress_map.get(task.id), selection) for task in tasks]
+    
+    return with_etag(list_response(result, page_info), etag)
+
+# Delta-sync: tasks thay đổi + tasks đã xóa/rời phạm vi kể từ cursor
+@task_bp.route('/changes', methods=['GET'])
+def get_task_changes():
+    """Gọi không có cursor để lấy toàn bộ, sau đó gửi lại next_cursor để chỉ nhận phần thay đổi"""
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({'message': 'Missing user_id parameter'}), 400
+
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    limit = request.args.get('limit', SYNC_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_SYNC_PAGE_SIZE))
 
-# Helper function để tính progress
-def calculate_task_progress(task):
-    """Calculate task progress based on status and subtasks"""
-    if task.status == 'done':
-        return 100
-    elif task.status == 'doing':
-        # Check if has subtasks
-        subtasks = Task.query.filter_by(parent_task_id=task.id).all()
-        if subtasks:
-            completed_subtasks = len([st for st in subtasks if st.status == 'done'])
-            return int((completed_subtasks / len(subtasks)) * 100) if len(subtasks) > 0 else 25
-        else:
-            return 50  # Default for "doing" without subtasks
-    else:  # todo
-        return 0
+    task_position = tombstone_position = None
+    if request.args.get('cursor'):
+        try:
+            task_position, tombstone_position = decode_sync_cursor(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        # Tombstone cũ đã bị dọn (cleanup_task_tombstones cùng mốc), cursor quá cũ không còn biết task nào đã xóa
+        positions = [p for p in (task_position, tombstone_position) if p]
+        if positions and min(p[0] for p in positions) < tombstone_cutoff(current_app.config):
+            return jsonify({'message': 'Cursor expired, full resync required'}), 410
+
+    try:
+        selection = parse_task_fields(request.args, TASK_RELATIONSHIPS)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    task_query = filter_visible_tasks(Task.query, user).options(*selection.query_options())
+    # Task vẫn còn trong phạm vi (vd: chuyển giữa 2 member cùng nhóm) thì không gửi tombstone
+    visible_ids = filter_visible_tasks(Task.query, user).with_entities(Task.id)
+    tombstone_query = filter_visible_tasks(TaskTombstone.query, user, TaskTombstone).filter(
+        ~TaskTombstone.task_id.in_(visible_ids)
+    )
+
+    tasks, tombstones, has_more, next_cursor = fetch_task_changes(
+        task_query, tombstone_query, task_position, tombstone_position, limit
+    )
+    progress_map = get_progress_map(tasks) if selection.wants('progress') else {}
+
+    return jsonify({
+        'upserted': [format_task_item(task, progress_map.get(task.id), selection) for task in tasks],
+        'deleted': sorted({tombstone.task_id for tombstone in tombstones}),
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'full_sync': task_position is None and tombstone_position is None
+    })
 
 # Lấy tasks theo group
 @task_bp.route('/group/<int:group_id>', methods=['GET'])
 def get_tasks_by_group(group_id):
+    etag = list_etag(*task_version(), *user_version(), *group_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+
     group = Group.query.get(group_id)
     if not group:
         return jsonify({'message': 'Group not found'}), 404
 
-    tasks = Task.query.filter_by(group_id=group_id).order_by(Task.created_at.desc()).all()
+    try:
+        selection = parse_task_fields(request.args, ('assigner', 'assignee'))
+        query = Task.query.filter_by(group_id=group_id).options(*selection.query_options())
+        tasks, page_info = fetch_tasks(query)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     result = []
     for task in tasks:
-        assigner = User.query.get(task.assigner_id) if task.assigner_id else None
-        assignee = User.query.get(task.assignee_id) if task.assignee_id else None
-        
-        result.append({
+        item = {
             'id': task.id,
             'title': task.title,
-            'description': task.description,
             'status': task.status,
             'priority': task.priority,
             'deadline': task.deadline.strftime('%Y-%m-%d %H:%M:%S') if task.deadline else None,
             'parent_task_id': task.parent_task_id,
-            'assigner': {
+            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None
+        }
+        if selection.wants('description'):
+            item['description'] = task.description
+        if selection.wants('assigner'):
+            assigner = task.assigner
+            item['assigner'] = {
                 'id': assigner.id,
                 'name': assigner.name
-            } if assigner else None,
-            'assignee': {
+            } if assigner else None
+        if selection.wants('assignee'):
+            assignee = task.assignee
+            item['assignee'] = {
                 'id': assignee.id,
                 'name': assignee.name,
                 'employee_code': assignee.employee_code
-            } if assignee else None,
-            'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None
-        })
-    return jsonify(result)
+            } if assignee else None
+        result.append(selection.pick(item))
+    return with_etag(list_response(result, page_info), etag)
 
 # Lấy subtasks của 1 task
 @task_bp.route('/<int:task_id>/subtasks', methods=['GET'])
@@ -413,26 +570,52 @@ def get_subtasks(task_id):
     if not parent_task:
         return jsonify({'message': 'Parent task not found'}), 404
 
-    subtasks = Task.query.filter_by(parent_task_id=task_id).all()
+    try:
+        selection = parse_task_fields(request.args, ('assignee',))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    subtasks = Task.query.filter_by(parent_task_id=task_id).options(*selection.query_options()).all()
     result = []
     for subtask in subtasks:
-        assignee = User.query.get(subtask.assignee_id) if subtask.assignee_id else None
-        
-        result.append({
+        item = {
             'id': subtask.id,
             'title': subtask.title,
-            'description': subtask.description,
             'status': subtask.status,
             'priority': subtask.priority,
             'deadline': subtask.deadline.strftime('%Y-%m-%d %H:%M:%S') if subtask.deadline else None,
-            'assignee': {
+            'created_at': subtask.created_at.strftime('%Y-%m-%d %H:%M:%S') if subtask.created_at else None
+        }
+        if selection.wants('description'):
+            item['description'] = subtask.description
+        if selection.wants('assignee'):
+            assignee = subtask.assignee
+            item['assignee'] = {
                 'id': assignee.id,
                 'name': assignee.name
-            } if assignee else None,
-            'created_at': subtask.created_at.strftime('%Y-%m-%d %H:%M:%S') if subtask.created_at else None
-        })
+            } if assignee else None
+        result.append(selection.pick(item))
     return jsonify(result)
 
+# Lấy cả cây subtasks (mọi cấp) của 1 task
+@task_bp.route('/<int:task_id>/tree', methods=['GET'])
+def get_task_tree(task_id):
+    """Trả về task và toàn bộ con cháu kèm depth, assignee và số task theo status"""
+    max_depth = request.args.get('max_depth', DEFAULT_TREE_DEPTH, type=int)
+    max_depth = max(0, min(max_depth, MAX_TREE_DEPTH))
+    
+    # 1 recursive CTE cho cả cây, không query từng cấp
+    rows = fetch_subtree_rows(task_id, max_depth)
+    tree = build_task_tree(rows, max_depth)
+    if not tree:
+        return jsonify({'message': 'Task not found'}), 404
+    
+    return jsonify({
+        'max_depth': max_depth,
+        'total_nodes': len(rows),
+        'tree': tree
+    })
+
 # Cập nhật task
 @task_bp.route('/<int:task_id>', methods=['PUT'])
 def update_task(task_id):
@@ -457,6 +640,9 @@ def update_task(task_id):
             return jsonify({'message': 'Invalid priority. Must be low, medium, or high'}), 400
         task.priority = data['priority']
 
+    # Lấy status cũ trước khi gán giá trị mới để notification so sánh đúng
+    old_status = task.status
+
     # Cập nhật các trường khác
     task.title = data.get('title', task.title)
     task.description = data.get('description', task.description)
@@ -465,37 +651,150 @@ def update_task(task_id):
     task.group_id = data.get('group_id', task.group_id)
     
     try:
-        old_status = task.status
-        db.session.commit()
-        
+        # Notification được INSERT cùng commit với task (defer)
         if old_status != 'done' and task.status == 'done':
             if task.assigner_id and task.assigner_id != task.assignee_id:
                 assignee = User.query.get(task.assignee_id)
-                create_notification(
-                    user_id=task.assigner_id,
-                    title=f"Task completed: {task.title}",
-                    message=f"Task '{task.title}' has been completed by {assignee.name if assignee else 'assignee'}",
-                    notification_type=NotificationType.TASK_COMPLETED,
-                    task_id=task.id
-                )
+                create_notifications([(
+                    task.assigner_id,
+                    f"Task completed: {task.title}",
+                    f"Task '{task.title}' has been completed by {assignee.name if assignee else 'assignee'}",
+                    NotificationType.TASK_COMPLETED,
+                    {'task_id': task.id}
+                )], defer=True)
         
         # ✅ THÊM: Notification for task updates
         elif old_status != task.status:
             if task.assigner_id and task.assigner_id != task.assignee_id:
                 assignee = User.query.get(task.assignee_id)
-                create_notification(
-                    user_id=task.assigner_id,
-                    title=f"Task updated: {task.title}",
-                    message=f"Task '{task.title}' status changed from {old_status} to {task.status} by {assignee.name if assignee else 'assignee'}",
-                    notification_type=NotificationType.TASK_UPDATED,
-                    task_id=task.id
-                )
+                create_notifications([(
+                    task.assigner_id,
+                    f"Task updated: {task.title}",
+                    f"Task '{task.title}' status changed from {old_status} to {task.status} by {assignee.name if assignee else 'assignee'}",
+                    NotificationType.TASK_UPDATED,
+                    {'task_id': task.id}
+                )], defer=True)
+        
+        db.session.commit()
         
         return jsonify({'message': 'Task updated successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error updating task: {str(e)}'}), 500
 
+# Cập nhật status/priority/assignee cho nhiều task trong 1 transaction (kéo thả board, đổi hàng loạt)
+@task_bp.route('/batch', methods=['PATCH'])
+def batch_update_tasks():
+    data = request.get_json() or {}
+    task_ids = data.get('task_ids') or []
+    if not isinstance(task_ids, list) or not task_ids:
+        return jsonify({'message': 'No task_ids specified'}), 400
+    # "1" hay true không khớp Task.id nào, sẽ bị báo nhầm là 404 nếu không chặn ở đây
+    if not all(isinstance(task_id, int) and not isinstance(task_id, bool) for task_id in task_ids):
+        return jsonify({'message': 'task_ids must be a list of integers'}), 400
+    if len(task_ids) > MAX_BATCH_UPDATE:
+        return jsonify({'message': f'Too many tasks, maximum is {MAX_BATCH_UPDATE}'}), 400
+    task_ids = list(dict.fromkeys(task_ids))
+
+    values = {}
+    if 'status' in data:
+        if data['status'] not in ['todo', 'doing', 'done']:
+            return jsonify({'message': 'Invalid status. Must be todo, doing, or done'}), 400
+        values['status'] = data['status']
+    if 'priority' in data:
+        if data['priority'] not in ['low', 'medium', 'high']:
+            return jsonify({'message': 'Invalid priority. Must be low, medium, or high'}), 400
+        values['priority'] = data['priority']
+    new_assignee = None
+    if 'assignee_id' in data:
+        new_assignee = User.query.get(data['assignee_id'])
+        if not new_assignee:
+            return jsonify({'message': f"Assignee with ID {data['assignee_id']} not found"}), 400
+        values['assignee_id'] = new_assignee.id
+    if not values:
+        return jsonify({'message': 'Nothing to update. Provide status, priority or assignee_id'}), 400
+
+    started = time.perf_counter()
+    # Đọc trạng thái cũ 1 lần cho cả batch (status cũ, parent, người nhận notification)
+    rows = db.session.query(
+        Task.id, Task.title, Task.status, Task.priority, Task.parent_task_id,
+        Task.assigner_id, Task.assignee_id, Task.group_id, User.name
+    ).outerjoin(User, User.id == Task.assignee_id).filter(Task.id.in_(task_ids)).all()
+
+    missing = set(task_ids) - {row.id for row in rows}
+    if missing:
+        return jsonify({'message': 'Some tasks not found', 'missing_ids': sorted(missing)}), 404
+
+    try:
+        Task.query.filter(Task.id.in_(task_ids)).update(values, synchronize_session=False)
+
+        # Task đổi assignee: tombstone theo phạm vi cũ cho delta-sync
+        if new_assignee:
+            record_task_tombstones(db.session.connection(), [{
+                'task_id': row.id,
+                'assignee_id': row.assignee_id,
+                'assigner_id': row.assigner_id,
+                'group_id': row.group_id
+            } for row in rows if row.assignee_id != new_assignee.id])
+
+        # UPDATE hàng loạt không chạy mapper event nên tự cộng counter của parent
+        new_status = values.get('status')
+        if new_status:
+            deltas = {}
+            for row in rows:
+                change = int(new_status == 'done') - int(row.status == 'done')
+                if row.parent_task_id and change:
+                    deltas.setdefault(row.parent_task_id, [0, 0])[1] += change
+            apply_subtask_deltas(db.session, deltas)
+
+        notifications = []
+        for row in rows:
+            assignee_id = values.get('assignee_id', row.assignee_id)
+            assignee_name = new_assignee.name if new_assignee else row.name
+            if new_status and new_status != row.status and row.assigner_id and row.assigner_id != assignee_id:
+                if new_status == 'done':
+                    notifications.append((
+                        row.assigner_id,
+                        f"Task completed: {row.title}",
+                        f"Task '{row.title}' has been completed by {assignee_name or 'assignee'}",
+                        NotificationType.TASK_COMPLETED,
+                        {'task_id': row.id}
+                    ))
+                else:
+                    notifications.append((
+                        row.assigner_id,
+                        f"Task updated: {row.title}",
+                        f"Task '{row.title}' status changed from {row.status} to {new_status} by {assignee_name or 'assignee'}",
+                        NotificationType.TASK_UPDATED,
+                        {'task_id': row.id}
+                    ))
+            if new_assignee and new_assignee.id != row.assignee_id and new_assignee.id != row.assigner_id:
+                notifications.append((
+                    new_assignee.id,
+                    f"New task assigned: {row.title}",
+                    f"You have been assigned the task '{row.title}'",
+                    NotificationType.TASK_ASSIGNED,
+                    {'task_id': row.id, 'is_important': values.get('priority', row.priority) == 'high'}
+                ))
+        create_notifications(notifications, defer=True)
+
+        queue_parent_options_invalidation(db.session, {row.group_id for row in rows})
+        if 'status' in values or 'assignee_id' in values:
+            queue_deadline_refresh(db.session, task_ids)
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+
+        return jsonify({
+            'message': f'Successfully updated {len(rows)} tasks',
+            'updated': len(rows),
+            'task_ids': task_ids,
+            'notifications_sent': len(notifications),
+            'elapsed_ms': round(elapsed * 1000, 2)
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error updating tasks: {str(e)}'}), 500
+
 # Xóa task
 @task_bp.route('/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
@@ -514,63 +813,73 @@ def delete_task(task_id):
 # Lấy thông tin chi tiết 1 task
 @task_bp.route('/<int:task_id>', methods=['GET'])
 def get_task_detail(task_id):
-    task = Task.query.get(task_id)
+    try:
+        selection = parse_task_fields(request.args, ('assigner', 'assignee', 'group', 'parent_task', 'subtasks'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Load task cùng các object được embed trong 1 query
+    task = Task.query.options(*selection.query_options()).filter_by(id=task_id).first()
     if not task:
         return jsonify({'message': 'Task not found'}), 404
 
-    # Lấy thông tin liên quan
-    assigner = User.query.get(task.assigner_id) if task.assigner_id else None
-    assignee = User.query.get(task.assignee_id) if task.assignee_id else None
-    group = Group.query.get(task.group_id) if task.group_id else None
-    parent_task = Task.query.get(task.parent_task_id) if task.parent_task_id else None
-    
-    # Lấy subtasks
-    subtasks = Task.query.filter_by(parent_task_id=task_id).all()
-    subtask_list = []
-    for subtask in subtasks:
-        subtask_assignee = User.query.get(subtask.assignee_id) if subtask.assignee_id else None
-        subtask_list.append({
-            'id': subtask.id,
-            'title': subtask.title,
-            'status': subtask.status,
-            'priority': subtask.priority,
-            'assignee': {
-                'id': subtask_assignee.id,
-                'name': subtask_assignee.name
-            } if subtask_assignee else None
-        })
-
-    return jsonify({
+    item = {
         'id': task.id,
         'title': task.title,
-        'description': task.description,
         'status': task.status,
         'priority': task.priority,
         'deadline': task.deadline.strftime('%Y-%m-%d %H:%M:%S') if task.deadline else None,
-        'assigner': {
+        'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None,
+        'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else None
+    }
+    if selection.wants('description'):
+        item['description'] = task.description
+    if selection.wants('assigner'):
+        assigner = task.assigner
+        item['assigner'] = {
             'id': assigner.id,
             'name': assigner.name,
             'email': assigner.email
-        } if assigner else None,
-        'assignee': {
+        } if assigner else None
+    if selection.wants('assignee'):
+        assignee = task.assignee
+        item['assignee'] = {
             'id': assignee.id,
             'name': assignee.name,
             'email': assignee.email,
             'employee_code': assignee.employee_code
-        } if assignee else None,
-        'group': {
+        } if assignee else None
+    if selection.wants('group'):
+        group = task.group
+        item['group'] = {
             'id': group.id,
             'name': group.name,
             'description': group.description
-        } if group else None,
-        'parent_task': {
+        } if group else None
+    if selection.wants('parent_task'):
+        parent_task = task.parent_task
+        item['parent_task'] = {
             'id': parent_task.id,
             'title': parent_task.title
-        } if parent_task else None,
-        'subtasks': subtask_list,
-        'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S') if task.created_at else None,
-        'updated_at': task.updated_at.strftime('%Y-%m-%d %H:%M:%S') if task.updated_at else None
-    })
+        } if parent_task else None
+
+    # Lấy subtasks (kèm assignee) bằng 1 query
+    if selection.wants('subtasks'):
+        subtasks = Task.query.filter_by(parent_task_id=task_id).options(
+            joinedload(Task.assignee), defer(Task.description)
+        ).all()
+        item['subtasks'] = [{
+            'id': subtask.id,
+            'title': subtask.title,
+            'status': subtask.status,
+            'priority': subtask.priority,
+            'assignee': {
+                'id': subtask.assignee.id,
+                'name': subtask.assignee.name
+            } if subtask.assignee else None
+        } for subtask in subtasks]
+
+    return jsonify(selection.pick(item))
 
 # Dashboard - Thống kê tasks
 @task_bp.route('/dashboard', methods=['GET'])
@@ -578,49 +887,72 @@ def get_dashboard_stats():
     user_id = request.args.get('user_id')
     group_id = request.args.get('group_id')
     
+    # Số task quá hạn / sắp hết hạn đổi theo thời gian nên ETag đổi mỗi phút
+    etag = list_etag(*task_version(), extra=int(time.time() // 60))
+    if etag_matches(etag):
+        return not_modified(etag)
+    
+    # Cache ngắn hạn theo (user_id, group_id) cho dashboard refresh liên tục.
+    # Lưu kèm ETag lúc tính: dữ liệu đổi (ETag khác) thì phải tính lại,
+    # không trả số cũ dưới ETag mới
+    dashboard_cache.ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 0)
+    cache_key = (user_id, group_id)
+    cached = dashboard_cache.get(cache_key)
+    if cached is not None and cached[0] == etag:
+        return with_etag(jsonify(cached[1]), etag)
+    
     # Tạo query cơ bản
-    query = Task.query
+    query = db.session.query(Task)
     
     if user_id:
         query = query.filter_by(assignee_id=user_id)
     if group_id:
         query = query.filter_by(group_id=group_id)
     
-    tasks = query.all()
+    # Tasks sắp hết hạn (trong vòng 3 ngày)
+    now = datetime.now()
+    upcoming_deadline = now + timedelta(days=3)
     
-    # Thống kê
-    total_tasks = len(tasks)
-    completed_tasks = len([t for t in tasks if t.status == 'done'])
-    in_progress_tasks = len([t for t in tasks if t.status == 'doing'])
-    todo_tasks = len([t for t in tasks if t.status == 'todo'])
+    def count_if(condition):
+        return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
     
-    high_priority_tasks = len([t for t in tasks if t.priority == 'high'])
-    medium_priority_tasks = len([t for t in tasks if t.priority == 'medium'])
-    low_priority_tasks = len([t for t in tasks if t.priority == 'low'])
+    # ✅ Thống kê bằng 1 query aggregate thay vì load toàn bộ tasks
+    stats = query.with_entities(
+        db.func.count(Task.id).label('total'),
+        count_if(Task.status == 'done').label('done'),
+        count_if(Task.status == 'doing').label('doing'),
+        count_if(Task.status == 'todo').label('todo'),
+        count_if(Task.priority == 'high').label('high'),
+        count_if(Task.priority == 'medium').label('medium'),
+        count_if(Task.priority == 'low').label('low'),
+        count_if(db.and_(Task.deadline < now, Task.status != 'done')).label('overdue'),
+        count_if(db.and_(Task.deadline <= upcoming_deadline, Task.deadline > now)).label('upcoming')
+    ).one()
     
-    # Tasks sắp hết hạn (trong vòng 3 ngày)
-    upcoming_deadline = datetime.now() + timedelta(days=3)
-    overdue_tasks = len([t for t in tasks if t.deadline and t.deadline < datetime.now() and t.status != 'done'])
-    upcoming_tasks = len([t for t in tasks if t.deadline and t.deadline <= upcoming_deadline and t.deadline > datetime.now()])
+    total_tasks = int(stats.total)
+    completed_tasks = int(stats.done)
     
-    return jsonify({
+    result = {
         'total_tasks': total_tasks,
         'status_breakdown': {
             'completed': completed_tasks,
-            'in_progress': in_progress_tasks,
-            'todo': todo_tasks
+            'in_progress': int(stats.doing),
+            'todo': int(stats.todo)
         },
         'priority_breakdown': {
-            'high': high_priority_tasks,
-            'medium': medium_priority_tasks,
-            'low': low_priority_tasks
+            'high': int(stats.high),
+            'medium': int(stats.medium),
+            'low': int(stats.low)
         },
         'deadline_status': {
-            'overdue': overdue_tasks,
-            'upcoming': upcoming_tasks
+            'overdue': int(stats.overdue),
+            'upcoming': int(stats.upcoming)
         },
         'completion_rate': f"{(completed_tasks/total_tasks*100):.1f}%" if total_tasks > 0 else "0%"
-    })
+    }
+    dashboard_cache.set(cache_key, (etag, result))
+    
+    return with_etag(jsonify(result), etag)
 
 @task_bp.route('/bulk-create', methods=['POST'])
 def bulk_create_tasks():
@@ -661,48 +993,190 @@ def bulk_create_tasks():
                 return jsonify({'message': f'User {assignee.name} is not in your group'}), 403
     
     try:
-        created_tasks = []
+        started = time.perf_counter()
         task_title = data.get('title')
+        task_description = data.get('description', '')
         task_priority = data.get('priority', 'medium')
-        
-        for assignee_id in assignee_ids:
-            task = Task(
-                title=data.get('title'),
-                description=data.get('description', ''),
-                status=data.get('status', 'todo'),
-                priority=data.get('priority', 'medium'),
-                deadline=datetime.strptime(data['deadline'], '%Y-%m-%d').date() if data.get('deadline') else None,
-                assignee_id=assignee_id,
-                assigner_id=assigner_id,
-                group_id=group_id,
-                created_at=datetime.utcnow()
-            )
-            db.session.add(task)
-            created_tasks.append(task)
-        
+        deadline = datetime.strptime(data['deadline'], '%Y-%m-%d').date() if data.get('deadline') else None
+        # Insert bằng Core không chạy before_insert nên gán week_key ở đây
+        created_at = task_timestamp()
+        week_key = week_key_for(created_at)
+
+        # 1 INSERT nhiều dòng cho tasks, 1 cho notifications, commit 1 lần
+        task_ids = bulk_insert(Task.__table__, [{
+            'title': task_title,
+            'description': task_description,
+            'status': data.get('status', 'todo'),
+            'priority': task_priority,
+            'deadline': deadline,
+            'assignee_id': assignee_id,
+            'assigner_id': assigner_id,
+            'group_id': group_id,
+            'created_at': created_at,
+            'week_key': week_key
+        } for assignee_id in assignee_ids])
+
+        notifications_sent = create_notifications([(
+            assignee_id,
+            f"New task assigned: {task_title}",
+            f"You have been assigned a new task '{task_title}' by {assigner.name}",
+            NotificationType.TASK_ASSIGNED,
+            {'task_id': task_id, 'is_important': task_priority == 'high', 'created_at': created_at}
+        ) for task_id, assignee_id in zip(task_ids, assignee_ids) if assignee_id != assigner_id], defer=True)
+
+        for task_id in task_ids:
+            queue_index_upsert(db.session, task_id, task_title, task_description)
+        queue_parent_options_invalidation(db.session, {group_id})
+        queue_deadline_refresh(db.session, task_ids)
         db.session.commit()
-        
-        for task in created_tasks:
-            if task.assignee_id != assigner_id: 
-                create_notification(
-                    user_id=task.assignee_id,
-                    title=f"New task assigned: {task_title}",
-                    message=f"You have been assigned a new task '{task_title}' by {assigner.name}",
-                    notification_type=NotificationType.TASK_ASSIGNED,
-                    task_id=task.id,
-                    is_important=task_priority == 'high'
-                )
-        
+
+        elapsed = time.perf_counter() - started
+        rows_per_second = round(len(task_ids) / elapsed, 1) if elapsed > 0 else None
+        print(f"✅ Bulk created {len(task_ids)} tasks, {notifications_sent} notifications in {elapsed * 1000:.1f}ms")
+
         return jsonify({
-            'message': f'Successfully created {len(created_tasks)} tasks',
-            'tasks_created': len(created_tasks),
-            'notifications_sent': len([t for t in created_tasks if t.assignee_id != assigner_id])
+            'message': f'Successfully created {len(task_ids)} tasks',
+            'tasks_created': len(task_ids),
+            'task_ids': task_ids,
+            'notifications_sent': notifications_sent,
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'rows_per_second': rows_per_second
         })
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error creating tasks: {str(e)}'}), 500
 
+@task_bp.route('/import', methods=['POST'])
+def import_tasks():
+    """Import tasks từ file CSV / NDJSON
+
+    File gửi qua multipart field 'file' hoặc là body của request. Dòng hợp lệ được insert
+    theo lô batch_size (commit sau mỗi lô), dòng lỗi được trả về trong báo cáo.
+    """
+    assigner_id = request.args.get('assigner_id', type=int)
+    assigner = User.query.get(assigner_id) if assigner_id else None
+    if not assigner:
+        return jsonify({'message': 'Assigner not found'}), 404
+
+    if assigner.role not in ['admin', 'leader']:
+        return jsonify({'message': 'Only admin and leaders can import tasks'}), 403
+
+    # Leader chỉ import tasks trong nhóm của mình
+    led_group_id = None
+    if assigner.role == 'leader':
+        led_group = Group.query.filter_by(leader_id=assigner.id).first()
+        if not led_group:
+            return jsonify({'message': 'You are not leading any group'}), 403
+        led_group_id = led_group.id
+
+    upload = request.files.get('file')
+    try:
+        fmt = detect_import_format(
+            request.args.get('format'),
+            upload.filename if upload else None,
+            upload.mimetype if upload else request.mimetype
+        )
+        records = iter_import_records(upload.stream if upload else request.stream, fmt)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    batch_size = request.args.get('batch_size', current_app.config.get('TASK_IMPORT_BATCH_SIZE', 1000), type=int)
+    batch_size = max(1, min(batch_size, MAX_IMPORT_BATCH_SIZE))
+    notify = request.args.get('notify', 'true').lower() != 'false'
+
+    started = time.perf_counter()
+    # ✅ Assignee / group kiểm tra bằng tập ID load sẵn, task cha load theo lô, không query theo từng dòng
+    lookups = ImportLookups()
+    stats = {'rows_processed': 0, 'tasks_created': 0, 'notifications_sent': 0, 'rows_failed': 0}
+    errors = []
+
+    def insert_batch(rows):
+        # Insert bằng Core không chạy mapper event: tự gán week_key, counter của parent, search index
+        created_at = task_timestamp()
+        week_key = week_key_for(created_at)
+        for row in rows:
+            row.update(assigner_id=assigner.id, created_at=created_at, week_key=week_key)
+        task_ids = bulk_insert(Task.__table__, rows, batch_size)
+
+        deltas = {}
+        for row in rows:
+            if row['parent_task_id']:
+                delta = deltas.setdefault(row['parent_task_id'], [0, 0])
+                delta[0] += 1
+                delta[1] += int(row['status'] == 'done')
+        apply_subtask_deltas(db.session, deltas)
+
+        notifications_sent = create_notifications([(
+            row['assignee_id'],
+            f"New task assigned: {row['title']}",
+            f"You have been assigned a new task '{row['title']}' by {assigner.name}",
+            NotificationType.TASK_ASSIGNED,
+            {'task_id': task_id, 'is_important': row['priority'] == 'high', 'created_at': created_at}
+        ) for task_id, row in zip(task_ids, rows)
+            if notify and row['assignee_id'] and row['assignee_id'] != assigner.id], defer=True)
+
+        for task_id, row in zip(task_ids, rows):
+            queue_index_upsert(db.session, task_id, row['title'], row['description'])
+        queue_parent_options_invalidation(db.session, {row['group_id'] for row in rows})
+        queue_deadline_refresh(db.session, [task_id for task_id, row in zip(task_ids, rows) if row['deadline']])
+        db.session.commit()
+
+        stats['tasks_created'] += len(task_ids)
+        stats['notifications_sent'] += notifications_sent
+
+    def report(status_code, message):
+        elapsed = time.perf_counter() - started
+        print(f"✅ Imported {stats['tasks_created']} tasks ({stats['rows_failed']} rows failed) in {elapsed * 1000:.1f}ms")
+        return jsonify({
+            'message': message,
+            **stats,
+            'errors': errors,
+            'errors_truncated': stats['rows_failed'] > len(errors),
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'rows_per_second': round(stats['rows_processed'] / elapsed, 1) if elapsed > 0 else None
+        }), status_code
+
+    def process_batch(entries):
+        lookups.preload_parents(record for _, record, _ in entries if record is not None)
+        rows = []
+        for line_number, record, error in entries:
+            row_errors = [error] if error else []
+            if record is not None:
+                values, row_errors = validate_import_record(record, lookups, led_group_id)
+            if row_errors:
+                stats['rows_failed'] += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append({'line': line_number, 'errors': row_errors})
+                continue
+            rows.append(values)
+        if rows:
+            insert_batch(rows)
+
+    batch = []
+    try:
+        for entry in records:
+            stats['rows_processed'] += 1
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                process_batch(batch)
+                batch = []
+
+        if batch:
+            process_batch(batch)
+    except ValueError as e:
+        # File hỏng giữa chừng: các lô trước đã commit, lô đang dở bị bỏ
+        db.session.rollback()
+        return report(400, str(e))
+    except Exception as e:
+        db.session.rollback()
+        return report(500, f'Error importing tasks: {str(e)}')
+
+    if not stats['rows_processed']:
+        return jsonify({'message': 'No rows to import'}), 400
+
+    return report(200, f"Imported {stats['tasks_created']} tasks")
+
 @task_bp.route('/parent-options', methods=['GET'])
 def get_parent_task_options():
     """Lấy danh sách tasks có thể làm parent task"""
@@ -710,19 +1184,38 @@ def get_parent_task_options():
     status = request.args.get('status', 'todo,doing')  # Default chỉ lấy tasks chưa hoàn thành
     assignee_id = request.args.get('assignee_id')
     limit = request.args.get('limit', 50, type=int)
-    
-    query = Task.query
+
+    group_id = int(group_id) if group_id else None
+    assignee_id = int(assignee_id) if assignee_id else None
+    status_list = status.split(',') if status else []
+
+    # Version của tasks/users (tên assignee): worker khác ghi thì ETag đổi dù hook xóa cache
+    # chỉ chạy ở process đã ghi
+    etag = list_etag(*task_version(), *user_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+
+    # ✅ Form tạo task gọi lại mỗi lần mở: cache theo bộ lọc, chỉ dùng khi ETag lúc tính còn khớp
+    parent_options_cache.ttl = current_app.config.get('PARENT_OPTIONS_CACHE_TTL', 0)
+    cache_key = parent_options_key(group_id, status_list, assignee_id, limit)
+    cached = parent_options_cache.get(cache_key)
+    if cached is not None and cached[0] == etag:
+        return with_etag(jsonify(cached[1]), etag)
+
+    # Tên assignee lấy bằng outer join thay vì query.get() cho từng task
+    query = db.session.query(
+        Task.id, Task.title, Task.status, Task.priority, Task.created_at, User.name.label('assignee_name')
+    ).outerjoin(User, User.id == Task.assignee_id)
     
     # Filters
-    if group_id:
-        query = query.filter_by(group_id=int(group_id))
+    if group_id is not None:
+        query = query.filter(Task.group_id == group_id)
     
-    if status:
-        status_list = status.split(',')
+    if status_list:
         query = query.filter(Task.status.in_(status_list))
     
-    if assignee_id:
-        query = query.filter_by(assignee_id=int(assignee_id))
+    if assignee_id is not None:
+        query = query.filter(Task.assignee_id == assignee_id)
     
     # Chỉ lấy main tasks (không phải subtasks)
     query = query.filter(Task.parent_task_id.is_(None))
@@ -731,15 +1224,14 @@ def get_parent_task_options():
     
     result = []
     for task in tasks:
-        assignee = User.query.get(task.assignee_id) if task.assignee_id else None
-        
         result.append({
             'id': task.id,
             'title': task.title,
             'status': task.status,
             'priority': task.priority,
-            'assignee': assignee.name if assignee else 'Unassigned',
+            'assignee': task.assignee_name if task.assignee_name is not None else 'Unassigned',
             'created_at': task.created_at.strftime('%Y-%m-%d %H:%M:%S')
         })
     
-    return jsonify(result)
\ No newline at end of file
+    parent_options_cache.set(cache_key, (etag, result))
+    return with_etag(jsonify(result), etag)
\ No newline at end of file
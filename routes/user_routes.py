@@ -7,12 +7,24 @@ from models.report import Report
 from models.group import Group
 from werkzeug.security import generate_password_hash
 import uuid
+from utils.streaming import get_stream_mode, stream_response
+from utils.etag import list_etag, etag_matches, not_modified, with_etag, task_version, user_version, group_version
 
 user_bp = Blueprint('user', __name__)
 
 # Lấy danh sách tất cả users với tìm kiếm/lọc
 @user_bp.route('/all', methods=['GET'])
 def get_all_users():
+    # ✅ Users / groups / tasks không đổi thì trả 304, không đếm lại tasks cho từng user
+    etag = list_etag(*user_version(), *group_version(), *task_version())
+    if etag_matches(etag):
+        return not_modified(etag)
+    
+    try:
+        stream_mode = get_stream_mode(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
     # Lấy tham số tìm kiếm
     role = request.args.get('role')  # employee, leader, admin
     group_id = request.args.get('group_id')
@@ -32,38 +44,46 @@ def get_all_users():
     if name:
         query = query.filter(User.name.like(f'%{name}%'))
     
-    users = query.all()
-    result = []
+    # ✅ Số task / group của mỗi user lấy trong cùng 1 query (outer join subquery GROUP BY)
+    task_stats = db.session.query(
+        Task.assignee_id.label('user_id'),
+        db.func.count(Task.id).label('total_tasks'),
+        db.func.sum(db.case((Task.status == 'done', 1), else_=0)).label('completed_tasks')
+    ).filter(Task.assignee_id.isnot(None)).group_by(Task.assignee_id).subquery()
+    query = query.outerjoin(task_stats, task_stats.c.user_id == User.id).outerjoin(
+        Group, Group.id == User.group_id
+    ).add_columns(
+        task_stats.c.total_tasks, task_stats.c.completed_tasks, Group.name.label('group_name')
+    ).order_by(User.id)
     
-    for user in users:
-        # Thống kê tasks của user
-        total_tasks = Task.query.filter_by(assignee_id=user.id).count()
-        completed_tasks = Task.query.filter_by(assignee_id=user.id, status='done').count()
-        
-        # Lấy thông tin group
-        group_info = None
-        if user.group_id:
-            group = Group.query.get(user.group_id)
-            group_info = {
-                'id': group.id,
-                'name': group.name
-            } if group else None
-        
-        result.append({
+    def serialize(row):
+        user = row[0]
+        total_tasks = int(row.total_tasks or 0)
+        completed_tasks = int(row.completed_tasks or 0)
+        return {
             'id': user.id,
             'employee_code': user.employee_code,
             'name': user.name,
             'email': user.email,
             'role': user.role,
-            'group': group_info,
+            'group': {
+                'id': user.group_id,
+                'name': row.group_name
+            } if row.group_name is not None else None,
             'is_active': user.is_active,
             'total_tasks': total_tasks,
             'completed_tasks': completed_tasks,
             'completion_rate': f"{(completed_tasks/total_tasks*100):.1f}%" if total_tasks > 0 else "0%",
             'created_at': user.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        })
+        }
     
-    return jsonify(result)
+    # stream=json|ndjson cho danh sách lớn: không build cả list trong bộ nhớ
+    if stream_mode:
+        return with_etag(stream_response(query, serialize, stream_mode), etag)
+    
+    result = [serialize(row) for row in query.all()]
+    
+    return with_etag(jsonify(result), etag)
 
 # Phân quyền: nâng user thành leader (chỉ admin)
 @user_bp.route('/promote/<int:user_id>', methods=['PUT'])
@@ -9,8 +9,9 @@ from sqlalchemy import text
 app = create_app()
 
 with app.app_context():
-    # Tạo bảng
-    db.create_all()
+    # Tạo bảng (migration có version)
+    from utils.migrations import run_migrations
+    run_migrations()
     
     # Tạo admin mặc định nếu chưa có
     admin = User.query.filter_by(role='admin').first()
@@ -206,7 +206,8 @@ function loadRecentActivity() {
 
 // Display recent activity
 function displayRecentActivity(tasks, reports, files) {
-    const tasksData = Array.isArray(tasks) ? tasks.slice(0, 3) : [];
+    const tasksList = Array.isArray(tasks) ? tasks : (tasks && tasks.tasks) || [];
+    const tasksData = tasksList.slice(0, 3);
     const reportsData = Array.isArray(reports) ? reports.slice(0, 2) : [];
     const filesData = Array.isArray(files) ? files.slice(0, 2) : [];
     
@@ -0,0 +1,45 @@
+# tests/conftest.py - App Flask dùng SQLite in-memory cho test (không cần MySQL)
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from database import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__, root_path=ROOT)
+    app.config.from_object(Config)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        DASHBOARD_CACHE_TTL=0
+    )
+    db.init_app(app)
+
+    with app.app_context():
+        import models  # noqa: F401 - đăng ký tất cả models với metadata
+        import utils.subtask_counters  # noqa: F401
+        import utils.data_versions  # noqa: F401
+        db.create_all()
+
+    from app import register_blueprints
+    register_blueprints(app)
+
+    yield app
+
+    # Mỗi app có engine SQLite in-memory riêng nên không cần drop_all
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
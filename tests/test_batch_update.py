@@ -0,0 +1,75 @@
+# PATCH /api/tasks/batch: cùng kết quả với PUT từng task, số query không tăng theo số task
+#
+# Chạy với -s để xem thời gian: python -m pytest -q -s tests/test_batch_update.py
+import time
+
+import pytest
+from sqlalchemy import event
+
+from database import db
+from test_task_list_queries import QueryCounter, seed_users, seed_tasks
+
+
+def timed_requests(app, send):
+    """Chạy send(), trả về (số query, thời gian ms, các response)"""
+    counter = QueryCounter()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    started = time.perf_counter()
+    try:
+        responses = send()
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+    return counter.count, (time.perf_counter() - started) * 1000, responses
+
+
+def task_state(app, task_ids):
+    from models import Task
+    with app.app_context():
+        tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+        return sorted((task.status, task.subtasks_done) for task in tasks)
+
+
+def test_batch_update_matches_per_task_loop(app, client):
+    from models import Task
+    from utils.subtask_counters import repair_subtask_counters
+
+    ids = seed_users(app)
+    seed_tasks(app, ids, 200)
+    with app.app_context():
+        task_ids = [task_id for (task_id,) in db.session.query(Task.id).order_by(Task.id)]
+    loop_ids, batch_ids = task_ids[:100], task_ids[100:]
+
+    loop_queries, loop_ms, responses = timed_requests(app, lambda: [
+        client.put(f'/api/tasks/{task_id}', json={'status': 'done'}) for task_id in loop_ids
+    ])
+    assert all(response.status_code == 200 for response in responses)
+
+    batch_queries, batch_ms, response = timed_requests(app, lambda: client.patch(
+        '/api/tasks/batch', json={'task_ids': batch_ids, 'status': 'done'}
+    ))
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == len(batch_ids)
+
+    print(f'\n{len(loop_ids)} x PUT: {loop_queries} queries, {loop_ms:.1f}ms; '
+          f'1 x PATCH /batch ({len(batch_ids)} tasks): {batch_queries} queries, {batch_ms:.1f}ms')
+
+    assert task_state(app, loop_ids) == task_state(app, batch_ids)
+    with app.app_context():
+        # Counter của parent được cộng đúng, không có dòng nào phải sửa
+        assert repair_subtask_counters() == 0
+    # Số query của batch cố định, vòng PUT tốn ít nhất 1 query mỗi task
+    assert batch_queries < 15, batch_queries
+    assert loop_queries > len(loop_ids)
+
+
+@pytest.mark.parametrize('task_ids', [['1'], [1, '2'], [True], [1.0], [None]])
+def test_batch_update_rejects_non_integer_ids(app, client, task_ids):
+    ids = seed_users(app)
+    seed_tasks(app, ids, 2)
+
+    response = client.patch('/api/tasks/batch', json={'task_ids': task_ids, 'status': 'done'})
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'task_ids must be a list of integers'
@@ -0,0 +1,93 @@
+# Số query của GET /api/tasks/all không được tăng theo số task (không N+1)
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from database import db
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def seed_users(app):
+    from models import User, Group
+    with app.app_context():
+        group = Group(name='Team A')
+        db.session.add(group)
+        db.session.flush()
+        admin = User(employee_code='A1', name='Admin', email='admin@x', password_hash='x', role='admin')
+        leader = User(employee_code='L1', name='Leader', email='leader@x', password_hash='x', role='leader', group_id=group.id)
+        employees = [
+            User(employee_code=f'E{i}', name=f'Employee {i}', email=f'e{i}@x', password_hash='x',
+                 role='employee', group_id=group.id)
+            for i in range(3)
+        ]
+        db.session.add_all([admin, leader, *employees])
+        db.session.flush()
+        group.leader_id = leader.id
+        db.session.commit()
+        return {
+            'admin': admin.id,
+            'leader': leader.id,
+            'employee': employees[0].id,
+            'group': group.id,
+            'employees': [employee.id for employee in employees]
+        }
+
+
+def seed_tasks(app, ids, count):
+    from models import Task
+    with app.app_context():
+        tasks = []
+        for i in range(count):
+            task = Task(
+                title=f'Task {i}',
+                description=f'Description {i}',
+                status=('todo', 'doing', 'done')[i % 3],
+                priority=('low', 'medium', 'high')[i % 3],
+                deadline=datetime.utcnow() + timedelta(days=i - 10),
+                assigner_id=ids['leader'],
+                assignee_id=ids['employees'][i % len(ids['employees'])],
+                group_id=ids['group'],
+                # Xen kẽ subtask để progress / parent cũng được load
+                parent_task_id=tasks[i - 1].id if i % 5 else None
+            )
+            db.session.add(task)
+            db.session.flush()
+            tasks.append(task)
+        db.session.commit()
+
+
+def count_list_queries(app, client, user_id):
+    counter = QueryCounter()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        response = client.get(f'/api/tasks/all?user_id={user_id}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+    assert response.status_code == 200
+    return counter.count, response.get_json()
+
+
+@pytest.mark.parametrize('role', ['admin', 'leader', 'employee'])
+def test_task_list_query_count_does_not_grow_with_tasks(app, client, role):
+    ids = seed_users(app)
+
+    empty_count, empty_body = count_list_queries(app, client, ids[role])
+    assert empty_body == []
+
+    seed_tasks(app, ids, 50)
+    full_count, full_body = count_list_queries(app, client, ids[role])
+    assert len(full_body) > 0
+
+    assert full_count == empty_count
+    # ETag version + user + tasks (join assigner/assignee/group/parent)
+    assert full_count <= 3, full_count
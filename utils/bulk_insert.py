@@ -0,0 +1,89 @@
+# utils/bulk_insert.py - INSERT nhiều dòng trong 1 statement, trả về ID đã tạo
+from sqlalchemy import insert
+from database import db
+from utils.data_versions import mark_table_changed
+
+DEFAULT_INSERT_BATCH = 1000
+
+
+def bulk_insert(table, rows, batch_size=DEFAULT_INSERT_BATCH):
+    """INSERT ... VALUES (...), (...) theo từng lô trong transaction hiện tại
+
+    Trả về list ID theo đúng thứ tự rows; không commit.
+    Không đi qua ORM nên các mapper event (before_insert, after_insert...) không chạy,
+    caller phải tự gán các cột mà event thường gán.
+    """
+    if not rows:
+        return []
+
+    dialect = db.engine.dialect
+    if dialect.insert_executemany_returning:
+        # SQLite >= 3.35 / PostgreSQL / MariaDB: executemany + RETURNING, SQLAlchemy tự gộp
+        # thành các INSERT nhiều dòng ("insertmanyvalues"), statement chỉ compile 1 lần.
+        # RETURNING không đảm bảo thứ tự nhưng ID auto increment tăng theo thứ tự VALUES
+        stmt = insert(table).returning(table.c.id)
+        ids = []
+        for i in range(0, len(rows), batch_size):
+            ids.extend(sorted(db.session.execute(stmt, rows[i:i + batch_size]).scalars()))
+        return ids
+
+    # MySQL: lastrowid là ID của dòng đầu tiên, các dòng sau cách nhau @@auto_increment_increment
+    # (1 trừ khi chạy replication nhiều master). Giả định: InnoDB cấp ID cho cả INSERT nhiều dòng
+    # (số dòng biết trước, "simple insert") trong 1 lần nên không bị transaction khác chen vào.
+    # MySQL đảm bảo điều này với innodb_autoinc_lock_mode 0/1; mode 2 (mặc định của MySQL 8)
+    # InnoDB vẫn cấp 1 lần cho simple insert nhưng tài liệu không cam kết ID liên tiếp.
+    # insert().values(list) phải compile lại cả statement cho mỗi lô (chậm với hàng nghìn dòng)
+    # nên ghép SQL với placeholder của driver và gửi thẳng tham số.
+    columns, defaults = _insert_columns(table, rows[0])
+    processors = [table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in columns]
+    preparer = dialect.identifier_preparer
+    prefix = 'INSERT INTO {} ({}) VALUES '.format(
+        preparer.format_table(table),
+        ', '.join(preparer.quote(name) for name in columns)
+    )
+    marker = '?' if dialect.paramstyle == 'qmark' else '%s'
+    placeholder = '(' + ', '.join([marker] * len(columns)) + ')'
+
+    connection = db.session.connection()
+    step = _auto_increment_step(connection)
+    ids = []
+    for i in range(0, len(rows), batch_size):
+        chunk = rows[i:i + batch_size]
+        params = []
+        for row in chunk:
+            for name, process in zip(columns, processors):
+                value = row[name] if name in row else defaults[name]()
+                params.append(process(value) if process else value)
+        result = connection.exec_driver_sql(prefix + ', '.join([placeholder] * len(chunk)), tuple(params))
+        mark_table_changed(connection, table)
+        ids.extend(range(result.lastrowid, result.lastrowid + len(chunk) * step, step))
+    return ids
+
+
+def _auto_increment_step(connection):
+    """Bước tăng ID auto increment của connection, đọc 1 lần rồi lưu trong connection.info"""
+    if connection.dialect.name != 'mysql':
+        return 1
+    if 'auto_increment_increment' not in connection.info:
+        connection.info['auto_increment_increment'] = int(
+            connection.exec_driver_sql('SELECT @@auto_increment_increment').scalar()
+        )
+    return connection.info['auto_increment_increment']
+
+
+def _insert_columns(table, row):
+    """Các cột cần INSERT: key của row và các cột có default phía Python (vd: is_read=False)"""
+    columns = list(row)
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if column.name in row or default is None or column.primary_key:
+            continue
+        if default.is_scalar:
+            defaults[column.name] = lambda value=default.arg: value
+        elif default.is_callable:
+            defaults[column.name] = lambda fn=default.arg: fn(None)
+        else:
+            continue
+        columns.append(column.name)
+    return columns, defaults
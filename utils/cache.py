@@ -0,0 +1,47 @@
+# utils/cache.py - Cache LRU có TTL dùng trong 1 process
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Cache LRU giới hạn maxsize, mỗi entry hết hạn sau ttl giây
+
+    ttl <= 0 nghĩa là tắt cache (get luôn miss, set không lưu).
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """Xóa các key thỏa predicate(key), hoặc xóa hết nếu không truyền"""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
@@ -0,0 +1,71 @@
+# utils/data_versions.py - Tăng version của tasks / users / groups trong transaction đã ghi
+#
+# Mọi INSERT/UPDATE/DELETE (ORM flush hay Core) lên các bảng trong SCOPE_TABLES được ghi nhận
+# trên connection; ngay trước COMMIT, version của các scope đó được +1 trong cùng transaction.
+# ETag đọc version này thay cho max(updated_at): transaction commit muộn (updated_at cũ hơn
+# dòng đã thấy) vẫn làm version đổi đúng lúc dữ liệu của nó hiện ra.
+# Câu lệnh text() không được nhận ra: ghi các bảng này bằng ORM / Core (hoặc gọi mark_table_changed).
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from models.data_version import DataVersion
+
+# Bảng -> scope version bị ảnh hưởng
+SCOPE_TABLES = {
+    'tasks': 'tasks',
+    'task_tombstones': 'tasks',
+    'users': 'users',
+    'groups': 'groups',
+}
+
+
+def mark_table_changed(connection, table):
+    """Ghi nhận bảng vừa bị ghi; exec_driver_sql không chạy after_execute nên caller tự gọi"""
+    scope = SCOPE_TABLES.get(table.name)
+    if scope:
+        connection.info.setdefault('data_version_scopes', set()).add(scope)
+
+
+def bump_versions(connection, scopes):
+    """version + 1 cho các scope trong transaction của connection"""
+    table = DataVersion.__table__
+    scopes = sorted(scopes)
+    result = connection.execute(
+        update(table).where(table.c.scope.in_(scopes)).values(version=table.c.version + 1)
+    )
+    if result.rowcount < len(scopes):
+        # DB tạo bằng create_all chưa có dòng của scope
+        existing = set(connection.execute(select(table.c.scope).where(table.c.scope.in_(scopes))).scalars())
+        connection.execute(insert(table), [{'scope': scope, 'version': 1} for scope in scopes if scope not in existing])
+
+
+def version_of(scope):
+    """Scalar subquery version hiện tại của scope (NULL nếu chưa ghi lần nào)"""
+    table = DataVersion.__table__
+    return select(table.c.version).where(table.c.scope == scope).scalar_subquery()
+
+
+@event.listens_for(Engine, 'after_execute')
+def _track_writes(connection, clauseelement, multiparams, params, execution_options, result):
+    if isinstance(clauseelement, UpdateBase):
+        mark_table_changed(connection, clauseelement.table)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_on_commit(session):
+    if session.in_nested_transaction():
+        return
+    # before_commit chạy trước lần flush cuối của commit: flush trước để ghi nhận đủ
+    session.flush()
+    connection = session.connection()
+    scopes = connection.info.pop('data_version_scopes', None)
+    if scopes:
+        bump_versions(connection, scopes)
+
+
+# Ghi ngoài Session (engine.begin...) hoặc transaction bị hủy: bỏ các scope đã ghi nhận
+@event.listens_for(Engine, 'commit')
+@event.listens_for(Engine, 'rollback')
+def _reset(connection):
+    connection.info.pop('data_version_scopes', None)
@@ -0,0 +1,218 @@
+# utils/deadline_timers.py - Hàng đợi deadline trong bộ nhớ để nhắc đúng lúc
+#
+# Heap (fire_at, task_id, kind, deadline) cho 2 ngưỡng của mỗi task mở: còn 24h ('soon')
+# và tới hạn ('overdue'). 1 thread ngủ tới entry gần nhất rồi gửi nhắc, không quét bảng
+# định kỳ. Heap được load từ DB lúc khởi động và cập nhật sau mỗi commit có task thay đổi
+# (mapper event, hoặc queue_deadline_refresh cho các chỗ ghi bằng Core), task do worker
+# khác ghi được lấy bằng poll_changes theo updated_at. Khi gửi vẫn kiểm tra lại với DB
+# nên entry cũ / thiếu chỉ làm chậm chứ không gửi sai.
+import heapq
+import threading
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from database import db
+from models.task import Task
+from utils.notification_scheduler import DEADLINE_SOON_WINDOW, WATERMARK_OVERLAP, notify_deadline_tasks
+
+# Số task mỗi query khi load lại / gửi nhắc
+TIMER_BATCH_SIZE = 1000
+
+
+class DeadlineTimers:
+    """Heap các mốc nhắc deadline và thread gửi nhắc khi tới mốc"""
+
+    def __init__(self):
+        self._heap = []
+        # task_id -> deadline hiện tại; entry trong heap có deadline khác là entry cũ, bỏ qua
+        self._deadlines = {}
+        self._pending_ids = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._app = None
+        self._polled_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        """Load các deadline sắp tới từ DB và chạy thread gửi nhắc"""
+        if self.running:
+            return
+        self._app = app
+        self._stopping = False
+        with app.app_context():
+            self._polled_at = datetime.utcnow()
+            count = self._load()
+        self._thread = threading.Thread(target=self._run, name='deadline-timers', daemon=True)
+        self._thread.start()
+        print(f"⏰ Deadline timers loaded {count} tasks")
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def refresh(self, task_ids):
+        """Đọc lại deadline của các task từ DB (gọi sau commit)"""
+        if not task_ids or not self.running:
+            return
+        with self._condition:
+            self._pending_ids.update(task_ids)
+            self._condition.notify()
+
+    def poll_changes(self):
+        """Load lại các task được sửa từ lần poll trước (kể cả do process khác ghi)
+
+        Task bị process khác xóa vẫn nằm trong heap tới lúc gửi, khi đó DB không còn task
+        nên không gửi gì.
+        """
+        if not self.running:
+            return
+        now = datetime.utcnow()
+        since = (self._polled_at or now) - WATERMARK_OVERLAP
+        task_ids = [task_id for (task_id,) in db.session.query(Task.id).filter(Task.updated_at > since)]
+        self._polled_at = now
+        self.refresh(task_ids)
+
+    def _schedule(self, task_id, deadline, now):
+        if self._deadlines.get(task_id) == deadline:
+            # Deadline không đổi: entry trong heap vẫn đúng, không đẩy thêm bản trùng
+            return
+        self._deadlines[task_id] = deadline
+        # Task tạo / dời deadline vào trong cửa sổ 24h thì nhắc 'soon' ngay
+        heapq.heappush(self._heap, (max(deadline - DEADLINE_SOON_WINDOW, now), task_id, 'soon', deadline))
+        heapq.heappush(self._heap, (deadline, task_id, 'overdue', deadline))
+
+    def _load(self, task_ids=None):
+        """Load deadline chưa tới của task mở (tất cả, hoặc chỉ task_ids), trả về số task"""
+        now = datetime.utcnow()
+        base_query = db.session.query(Task.id, Task.deadline).filter(
+            Task.deadline > now,
+            Task.status.in_(['todo', 'doing']),
+            Task.assignee_id.isnot(None)
+        )
+        if task_ids is None:
+            rows = base_query.all()
+        else:
+            task_ids = list(task_ids)
+            rows = []
+            for i in range(0, len(task_ids), TIMER_BATCH_SIZE):
+                rows.extend(base_query.filter(Task.id.in_(task_ids[i:i + TIMER_BATCH_SIZE])).all())
+
+        with self._condition:
+            if task_ids is None:
+                self._heap = []
+                self._deadlines = {}
+            else:
+                # Task đã xóa / hoàn thành / bỏ deadline: entry cũ trong heap sẽ bị bỏ qua
+                current = dict(rows)
+                for task_id in task_ids:
+                    if task_id not in current:
+                        self._deadlines.pop(task_id, None)
+            for task_id, deadline in rows:
+                self._schedule(task_id, deadline, now)
+            self._compact()
+            self._condition.notify()
+        return len(rows)
+
+    def _compact(self):
+        """Dựng lại heap khi entry cũ nhiều hơn entry còn hiệu lực; gọi khi đang giữ lock"""
+        # Mỗi task còn trong _deadlines có tối đa 2 entry hiệu lực ('soon', 'overdue')
+        if len(self._heap) <= 4 * max(len(self._deadlines), 1):
+            return
+        self._heap = [entry for entry in self._heap if self._deadlines.get(entry[1]) == entry[3]]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        """Lấy các entry đã tới mốc, bỏ entry cũ; gọi khi đang giữ lock"""
+        due = {'soon': [], 'overdue': []}
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, task_id, kind, deadline = heapq.heappop(self._heap)
+            if self._deadlines.get(task_id) != deadline:
+                continue
+            due[kind].append(task_id)
+            if kind == 'overdue':
+                del self._deadlines[task_id]
+        return due
+
+    def _wait_timeout(self):
+        if not self._heap:
+            return None
+        return max((self._heap[0][0] - datetime.utcnow()).total_seconds(), 0)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopping and not self._pending_ids and (
+                    not self._heap or self._heap[0][0] > datetime.utcnow()
+                ):
+                    self._condition.wait(self._wait_timeout())
+                if self._stopping:
+                    return
+                pending, self._pending_ids = self._pending_ids, set()
+
+            try:
+                with self._app.app_context():
+                    if pending:
+                        self._load(pending)
+                    now = datetime.utcnow()
+                    with self._condition:
+                        due = self._pop_due(now)
+                    soon, overdue = due['soon'], due['overdue']
+                    for i in range(0, max(len(soon), len(overdue)), TIMER_BATCH_SIZE):
+                        sent_soon, sent_overdue = notify_deadline_tasks(
+                            soon[i:i + TIMER_BATCH_SIZE], overdue[i:i + TIMER_BATCH_SIZE], now
+                        )
+                        if sent_soon or sent_overdue:
+                            print(f"⏰ Deadline timers: {sent_soon} due soon, {sent_overdue} overdue notified")
+            except Exception as e:
+                print(f"❌ Deadline timers error: {e}")
+
+
+deadline_timers = DeadlineTimers()
+
+
+# ✅ Cập nhật heap sau khi commit thành công
+def _pending_refresh(session):
+    return session.info.setdefault('deadline_timer_ids', set())
+
+
+def queue_deadline_refresh(session, task_ids):
+    """Cập nhật timer sau commit cho task ghi bằng Core (bulk insert/update không qua mapper event)"""
+    _pending_refresh(session).update(task_ids)
+
+
+@event.listens_for(Task, 'after_insert')
+@event.listens_for(Task, 'after_delete')
+def _queue_task(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.deadline is not None:
+        _pending_refresh(session).add(target.id)
+
+
+@event.listens_for(Task, 'after_update')
+def _queue_changed_task(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[attr].history.has_changes() for attr in ('deadline', 'status', 'assignee_id')):
+        return
+    session = object_session(target)
+    if session is not None:
+        _pending_refresh(session).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_refresh(session):
+    task_ids = session.info.pop('deadline_timer_ids', None)
+    if task_ids:
+        deadline_timers.refresh(task_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_refresh(session):
+    session.info.pop('deadline_timer_ids', None)
@@ -0,0 +1,79 @@
+# utils/etag.py - Weak ETag / If-None-Match cho các API danh sách
+#
+# ETag được tính từ "version" rẻ của các bảng mà response đọc tới cộng với path + query string.
+# tasks / users / groups dùng bộ đếm tăng trong transaction ghi (utils/data_versions.py) nên
+# transaction commit muộn vẫn đổi ETag; notifications / reports dùng count, max(id) từ index.
+# Dữ liệu không đổi thì chỉ tốn 1 query và trả 304, không build lại JSON.
+import hashlib
+from flask import request, make_response
+from sqlalchemy import select
+from database import db
+
+
+def _count(model, *criteria):
+    return select(db.func.count(model.id)).where(*criteria).scalar_subquery()
+
+
+def _max(column, *criteria):
+    return select(db.func.max(column)).where(*criteria).scalar_subquery()
+
+
+def task_version():
+    from utils.data_versions import version_of
+    # Insert/update/delete task (kể cả tombstone, counter subtasks) đều tăng version 'tasks'
+    return [version_of('tasks')]
+
+
+def user_version():
+    from utils.data_versions import version_of
+    return [version_of('users')]
+
+
+def group_version():
+    from utils.data_versions import version_of
+    return [version_of('groups')]
+
+
+def notification_version(user_id):
+    from models.notification import Notification
+    mine = Notification.user_id == user_id
+    return [
+        _count(Notification, mine),
+        _max(Notification.id, mine),
+        _count(Notification, mine, Notification.is_read.is_(True))
+    ]
+
+
+def report_version():
+    from models.report import Report
+    return [_count(Report), _max(Report.id)]
+
+
+def list_etag(*versions, extra=None):
+    """Tính ETag cho request hiện tại bằng 1 SELECT
+
+    extra: giá trị khác mà response phụ thuộc (vd: mốc thời gian cho số task quá hạn).
+    """
+    values = db.session.execute(select(*versions)).one()
+    payload = repr((request.full_path, [str(value) for value in values], extra))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def etag_matches(etag):
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def with_etag(response, etag):
+    """Gắn ETag vào response (Response hoặc giá trị trả về của view)"""
+    response = make_response(response)
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag, weak=True)
+        # Browser luôn hỏi lại server, nhận 304 thì dùng bản đã cache
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,242 @@
+# utils/migrations.py - Migration có version thay cho db.create_all()
+#
+# Mỗi migration là 1 hàm idempotent (kiểm tra bảng/cột/index trước khi tạo) nên
+# chạy an toàn trên cả DB mới lẫn DB đã tạo bằng create_all() trước đây.
+# Version đã chạy được lưu trong bảng schema_migrations.
+from datetime import datetime
+from sqlalchemy import inspect, text
+from database import db
+
+MIGRATION_LOCK_NAME = 'work_management_schema_migrations'
+
+
+def _existing_indexes(table_name):
+    return {index['name'] for index in inspect(db.engine).get_indexes(table_name)}
+
+
+def _existing_columns(table_name):
+    return {column['name'] for column in inspect(db.engine).get_columns(table_name)}
+
+
+def _create_missing_indexes(model, names):
+    existing = _existing_indexes(model.__tablename__)
+    for index in model.__table__.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(db.engine)
+            print(f"   + index {index.name} on {model.__tablename__}")
+
+
+def initial_schema():
+    """Tạo các bảng gốc (bảng đã tồn tại được giữ nguyên)"""
+    import models  # noqa: F401 - đăng ký tất cả models với metadata
+    db.create_all()
+
+
+def task_subtask_counters():
+    """Thêm cột subtasks_total / subtasks_done và backfill"""
+    columns = _existing_columns('tasks')
+    added = False
+    for name in ('subtasks_total', 'subtasks_done'):
+        if name not in columns:
+            db.session.execute(text(f'ALTER TABLE tasks ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'))
+            added = True
+    db.session.commit()
+    if added:
+        from utils.subtask_counters import repair_subtask_counters
+        repair_subtask_counters()
+
+
+def task_fulltext_index():
+    """FULLTEXT index cho search title + description (chỉ MySQL)"""
+    if db.engine.dialect.name != 'mysql':
+        return
+    from models.task import Task
+    _create_missing_indexes(Task, {'ft_tasks_title_description'})
+
+
+def hot_path_indexes():
+    """Composite index cho các query nóng của tasks/notifications/reports/join_requests"""
+    from models.task import Task
+    from models.notification import Notification
+    from models.report import Report
+    from models.join_request import JoinRequest
+
+    _create_missing_indexes(Task, {
+        'ix_tasks_assignee_created', 'ix_tasks_group_status',
+        'ix_tasks_deadline_status', 'ix_tasks_parent'
+    })
+    _create_missing_indexes(Notification, {'ix_notifications_user_read_created'})
+    _create_missing_indexes(Report, {'ix_reports_user_created'})
+    _create_missing_indexes(JoinRequest, {'ix_join_requests_group_status'})
+
+
+def backfill_task_week_keys(batch_size=5000):
+    """Gán week_key cho các task chưa có, trả về số dòng đã cập nhật"""
+    from sqlalchemy import bindparam, update
+    from models.task import Task
+    from utils.week_calendar import week_key_for
+
+    table = Task.__table__
+    if db.engine.dialect.name == 'mysql':
+        # %x-W%v là năm/tuần ISO giống datetime.isocalendar()
+        result = db.session.execute(text(
+            "UPDATE tasks SET week_key = DATE_FORMAT(created_at, '%x-W%v'), updated_at = updated_at "
+            "WHERE week_key IS NULL AND created_at IS NOT NULL"
+        ))
+        db.session.commit()
+        return result.rowcount
+
+    stmt = update(table).where(table.c.id == bindparam('task_id')).values(
+        week_key=bindparam('key'),
+        updated_at=table.c.updated_at
+    )
+    updated = 0
+    while True:
+        rows = db.session.query(Task.id, Task.created_at).filter(
+            Task.week_key.is_(None), Task.created_at.isnot(None)
+        ).order_by(Task.id).limit(batch_size).all()
+        if not rows:
+            break
+        db.session.execute(stmt, [{'task_id': task_id, 'key': week_key_for(created_at)} for task_id, created_at in rows])
+        db.session.commit()
+        updated += len(rows)
+    return updated
+
+
+def task_week_key():
+    """Cột week_key (tuần ISO của created_at) + index và backfill"""
+    if 'week_key' not in _existing_columns('tasks'):
+        db.session.execute(text('ALTER TABLE tasks ADD COLUMN week_key VARCHAR(8) NULL'))
+        db.session.commit()
+    from models.task import Task
+    _create_missing_indexes(Task, {'ix_tasks_week_assignee'})
+    backfill_task_week_keys()
+
+
+def task_tombstones():
+    """Bảng task_tombstones + index updated_at cho API delta-sync"""
+    from models.task import Task
+    from models.task_tombstone import TaskTombstone
+    TaskTombstone.__table__.create(db.engine, checkfirst=True)
+    _create_missing_indexes(Task, {'ix_tasks_updated'})
+
+
+def user_group_updated_at():
+    """Cột updated_at cho users / groups (dùng tính ETag của các API danh sách)"""
+    for table_name in ('users', 'groups'):
+        if 'updated_at' in _existing_columns(table_name):
+            continue
+        # groups là từ khóa từ MySQL 8 nên phải quote
+        table = db.engine.dialect.identifier_preparer.quote(table_name)
+        if db.engine.dialect.name == 'mysql':
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at DATETIME NULL DEFAULT CURRENT_TIMESTAMP'))
+        else:
+            # SQLite không cho ADD COLUMN với default không phải hằng số
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at DATETIME NULL'))
+        db.session.execute(text(f'UPDATE {table} SET updated_at = created_at'))
+    db.session.commit()
+
+
+def notification_task_type_index():
+    """Index (task_id, type, created_at) cho anti-join của job quét deadline"""
+    from models.notification import Notification
+    _create_missing_indexes(Notification, {'ix_notifications_task_type_created'})
+
+
+def notification_type_created_index():
+    """Index (type, created_at) cho job dọn notifications theo thời gian giữ của từng loại"""
+    from models.notification import Notification
+    _create_missing_indexes(Notification, {'ix_notifications_type_created'})
+
+
+def data_versions():
+    """Bảng data_versions (bộ đếm version cho ETag) và dòng khởi tạo của từng scope"""
+    from models.data_version import DataVersion
+    from utils.data_versions import SCOPE_TABLES
+    DataVersion.__table__.create(db.engine, checkfirst=True)
+    existing = {scope for (scope,) in db.session.query(DataVersion.scope)}
+    for scope in sorted(set(SCOPE_TABLES.values()) - existing):
+        db.session.add(DataVersion(scope=scope, version=0))
+    db.session.commit()
+
+
+def task_assigner_index():
+    """Index (assigner_id, created_at) cho nhánh assigner_id của điều kiện xem task (GET /api/tasks/all)"""
+    from models.task import Task
+    _create_missing_indexes(Task, {'ix_tasks_assigner_created'})
+
+
+def scheduler_state():
+    """Bảng scheduler_state lưu watermark của các job định kỳ"""
+    from models.scheduler_state import SchedulerState
+    SchedulerState.__table__.create(db.engine, checkfirst=True)
+
+
+# (version, tên, hàm) - chỉ được thêm vào cuối, không sửa migration đã phát hành
+MIGRATIONS = [
+    (1, 'initial_schema', initial_schema),
+    (2, 'task_subtask_counters', task_subtask_counters),
+    (3, 'task_fulltext_index', task_fulltext_index),
+    (4, 'hot_path_indexes', hot_path_indexes),
+    (5, 'task_week_key', task_week_key),
+    (6, 'task_tombstones', task_tombstones),
+    (7, 'user_group_updated_at', user_group_updated_at),
+    (8, 'notification_task_type_index', notification_task_type_index),
+    (9, 'scheduler_state', scheduler_state),
+    (10, 'notification_type_created_index', notification_type_created_index),
+    (11, 'data_versions', data_versions),
+    (12, 'task_assigner_index', task_assigner_index),
+]
+
+
+def _ensure_version_table():
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER NOT NULL PRIMARY KEY, '
+        'name VARCHAR(100) NOT NULL, '
+        'applied_at DATETIME NOT NULL)'
+    ))
+    db.session.commit()
+
+
+def get_applied_versions():
+    _ensure_version_table()
+    return {row[0] for row in db.session.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def run_migrations():
+    """Chạy các migration chưa áp dụng theo thứ tự version, trả về list tên đã chạy"""
+    lock_conn = None
+    if db.engine.dialect.name == 'mysql':
+        # Nhiều worker khởi động cùng lúc chỉ 1 process được chạy migration.
+        # Lock giữ trên connection riêng vì session trả connection về pool sau mỗi commit.
+        lock_conn = db.engine.connect()
+        locked = lock_conn.execute(text('SELECT GET_LOCK(:name, 60)'), {'name': MIGRATION_LOCK_NAME}).scalar()
+        if locked != 1:
+            # 0: hết 60s vẫn chưa lấy được khóa, NULL: lỗi phía MySQL. Không chạy migration khi chưa có khóa
+            lock_conn.close()
+            raise RuntimeError(f'Cannot acquire migration lock {MIGRATION_LOCK_NAME!r} (GET_LOCK returned {locked})')
+
+    applied_now = []
+    try:
+        applied = get_applied_versions()
+        for version, name, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            print(f"🔧 Applying migration {version:03d}_{name}")
+            migrate()
+            db.session.execute(
+                text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)'),
+                {'version': version, 'name': name, 'applied_at': datetime.utcnow()}
+            )
+            db.session.commit()
+            applied_now.append(name)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if lock_conn is not None:
+            lock_conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': MIGRATION_LOCK_NAME})
+            lock_conn.close()
+
+    return applied_now
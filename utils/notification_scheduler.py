@@ -1,31 +1,103 @@
 # Tạo utils/notification_scheduler.py
 from datetime import datetime, timedelta
+import os
+import time
 from models.task import Task
-from models.user import User
-from routes.notification_routes import create_notification, NotificationType
+from models.notification import NotificationType
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
 
-def setup_notification_scheduler(app):
-    """Setup background scheduler for notifications"""
-    try:
-        scheduler = BackgroundScheduler()
-        
-        # Check deadlines every hour
+def _in_app_context(app, func):
+    """Job chạy trong thread của scheduler, cần app context để dùng db.session"""
+    def run():
+        with app.app_context():
+            return func()
+    return run
+
+# Các job chỉ process giữ scheduler lock được chạy
+LEADER_JOB_IDS = ('deadline_notifications', 'notification_cleanup', 'tombstone_cleanup', 'deadline_timer_poll')
+
+def _start_leader_jobs(app, scheduler):
+    """Đăng ký các job định kỳ khi process này trở thành leader"""
+    # Check deadlines (incremental theo watermark nên chạy thường xuyên vẫn rẻ)
+    scheduler.add_job(
+        func=_in_app_context(app, check_task_deadlines),
+        trigger="interval",
+        minutes=app.config.get('DEADLINE_CHECK_INTERVAL_MINUTES', 15),
+        next_run_time=datetime.now(),  # Bù các mốc bị lỡ khi chưa có leader
+        id='deadline_notifications',
+        replace_existing=True
+    )
+    
+    # Daily cleanup of old notifications (thời gian giữ theo loại: NOTIFICATION_RETENTION_*)
+    scheduler.add_job(
+        func=_in_app_context(app, cleanup_old_notifications),
+        trigger="cron", 
+        hour=2,  # Run at 2 AM daily
+        id='notification_cleanup',
+        replace_existing=True
+    )
+    
+    # Dọn tombstone của delta-sync quá TASK_TOMBSTONE_RETENTION_DAYS
+    scheduler.add_job(
+        func=_in_app_context(app, cleanup_task_tombstones),
+        trigger="cron",
+        hour=2,
+        minute=30,
+        id='tombstone_cleanup',
+        replace_existing=True
+    )
+    
+    # Nhắc đúng mốc bằng timer trong bộ nhớ; job quét ở trên chỉ còn để đối soát
+    # (nhắc quá hạn hằng ngày, lúc không có leader)
+    if app.config.get('DEADLINE_TIMERS_ENABLED', True):
+        from utils.deadline_timers import deadline_timers
+        deadline_timers.start(app)
+        # Task do worker khác ghi không đi qua hook của process này
         scheduler.add_job(
-            func=check_task_deadlines,
+            func=_in_app_context(app, deadline_timers.poll_changes),
             trigger="interval",
-            hours=1,
-            id='deadline_notifications',
+            minutes=1,
+            id='deadline_timer_poll',
             replace_existing=True
         )
+
+def _stop_leader_jobs(scheduler):
+    from utils.deadline_timers import deadline_timers
+    for job_id in LEADER_JOB_IDS:
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+    deadline_timers.stop()
+
+def setup_notification_scheduler(app):
+    """Setup background scheduler for notifications
+
+    Mọi worker đều chạy scheduler nhưng chỉ process giữ scheduler lock chạy các job;
+    process khác thử lấy khóa định kỳ để thay thế khi leader chết.
+    """
+    from utils.scheduler_lock import SchedulerLock
+
+    try:
+        scheduler = BackgroundScheduler()
+        lock = SchedulerLock(app.config['SCHEDULER_LOCK_NAME'], app.config['SCHEDULER_LOCK_FILE'])
+        
+        def elect_leader():
+            with app.app_context():
+                if lock.held:
+                    if lock.still_held():
+                        return
+                    print(f"⚠️ Scheduler lock lost, stopping jobs in process {os.getpid()}")
+                    _stop_leader_jobs(scheduler)
+                if lock.acquire():
+                    print(f"👑 Process {os.getpid()} acquired scheduler lock, running scheduled jobs")
+                    _start_leader_jobs(app, scheduler)
         
-        # Daily cleanup of old notifications (keep last 30 days)
         scheduler.add_job(
-            func=cleanup_old_notifications,
-            trigger="cron", 
-            hour=2,  # Run at 2 AM daily
-            id='notification_cleanup',
+            func=elect_leader,
+            trigger="interval",
+            seconds=app.config.get('SCHEDULER_LOCK_RETRY_SECONDS', 15),
+            next_run_time=datetime.now(),
+            id='scheduler_leader_election',
             replace_existing=True
         )
         
@@ -33,83 +105,315 @@ def setup_notification_scheduler(app):
         print("🚀 Notification scheduler started successfully")
         
         # Shut down the scheduler when exiting the app
-        atexit.register(lambda: scheduler.shutdown())
+        def shutdown():
+            scheduler.shutdown()
+            _stop_leader_jobs(scheduler)
+            lock.release()
+        atexit.register(shutdown)
         
     except Exception as e:
         print(f"❌ Failed to setup notification scheduler: {e}")
         raise e
 
-def cleanup_old_notifications():
-    """Clean up notifications older than 30 days"""
+def notification_retention_days(config):
+    """{NotificationType: số ngày giữ} từ NOTIFICATION_RETENTION_DAYS + NOTIFICATION_RETENTION_BY_TYPE"""
+    default_days = config.get('NOTIFICATION_RETENTION_DAYS', 30)
+    retention = {notification_type: default_days for notification_type in NotificationType}
+    for item in config.get('NOTIFICATION_RETENTION_BY_TYPE', '').split(','):
+        if not item.strip():
+            continue
+        name, _, days = item.partition('=')
+        try:
+            retention[NotificationType(name.strip().lower())] = int(days)
+        except ValueError:
+            raise ValueError(f"Invalid NOTIFICATION_RETENTION_BY_TYPE entry: {item.strip()!r}")
+    return retention
+
+def _delete_chunk(table, criteria, batch_size):
+    """Xóa tối đa batch_size dòng của table thỏa criteria, trả về số dòng đã xóa"""
+    from sqlalchemy import delete, select
+    from database import db
+
+    if db.engine.dialect.name == 'mysql':
+        statement = delete(table).where(*criteria).with_dialect_options(mysql_limit=batch_size)
+    else:
+        # DB khác không có DELETE ... LIMIT: xóa theo lô id
+        chunk_ids = select(table.c.id).where(*criteria).limit(batch_size).scalar_subquery()
+        statement = delete(table).where(table.c.id.in_(chunk_ids))
+    return db.session.execute(statement).rowcount
+
+def cleanup_old_notifications(now=None):
+    """Clean up notifications older than their retention period
+
+    Xóa từng lô DELETE ... LIMIT (NOTIFICATION_CLEANUP_BATCH_SIZE), commit sau mỗi lô và
+    nghỉ NOTIFICATION_CLEANUP_PAUSE_SECONDS giữa các lô để không giữ lock lâu / chiếm DB.
+    Thời gian giữ theo từng loại (notification_retention_days), loại có 0 ngày được giữ mãi.
+    """
+    from flask import current_app
+    from models.notification import Notification
+    from database import db
+
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    config = current_app.config
+    batch_size = config.get('NOTIFICATION_CLEANUP_BATCH_SIZE', 5000)
+    pause = config.get('NOTIFICATION_CLEANUP_PAUSE_SECONDS', 0.2)
+    table = Notification.__table__
+
+    deleted = 0
+    chunks = 0
+    delete_seconds = 0.0
+    deleted_by_days = {}
     try:
-        from models.notification import Notification
-        from database import db
-        
-        cutoff_date = datetime.utcnow() - timedelta(days=30)
-        
-        old_notifications = Notification.query.filter(
-            Notification.created_at < cutoff_date
-        ).all()
-        
-        count = len(old_notifications)
-        
-        for notification in old_notifications:
-            db.session.delete(notification)
-        
-        db.session.commit()
-        print(f"🧹 Cleaned up {count} old notifications")
-        
+        # Gom các loại có cùng thời gian giữ để mỗi mốc chỉ cần 1 vòng xóa
+        types_by_days = {}
+        for notification_type, days in notification_retention_days(config).items():
+            if days > 0:
+                types_by_days.setdefault(days, []).append(notification_type)
+
+        for days, types in sorted(types_by_days.items()):
+            cutoff = now - timedelta(days=days)
+            deleted_by_days[days] = 0
+            while True:
+                chunk_started = time.perf_counter()
+                count = _delete_chunk(table, (table.c.type.in_(types), table.c.created_at < cutoff), batch_size)
+                db.session.commit()
+                delete_seconds += time.perf_counter() - chunk_started
+                chunks += 1
+                deleted += count
+                deleted_by_days[days] += count
+                if count < batch_size:
+                    break
+                time.sleep(pause)
     except Exception as e:
+        db.session.rollback()
         print(f"❌ Error cleaning up notifications: {e}")
+        return None
 
-def check_task_deadlines():
-    """Check for tasks approaching deadline and overdue tasks"""
-    now = datetime.utcnow()
-    tomorrow = now + timedelta(days=1)
-    
-    # Tasks due within 24 hours
-    upcoming_tasks = Task.query.filter(
-        Task.deadline <= tomorrow,
-        Task.deadline > now,
-        Task.status.in_(['todo', 'doing'])
-    ).all()
-    
-    for task in upcoming_tasks:
-        if task.assignee_id:
-            create_notification(
-                user_id=task.assignee_id,
-                title=f"Task deadline approaching: {task.title}",
-                message=f"Task '{task.title}' is due within 24 hours",
-                notification_type=NotificationType.TASK_DEADLINE_SOON,
-                task_id=task.id,
-                is_important=True
+    elapsed = time.perf_counter() - started
+    rows_per_second = deleted / delete_seconds if delete_seconds else 0
+    print(
+        f"🧹 Cleaned up {deleted} old notifications in {chunks} chunks, {elapsed:.1f}s "
+        f"({rows_per_second:.0f} rows/s)"
+    )
+    return {
+        'deleted': deleted,
+        'deleted_by_retention_days': deleted_by_days,
+        'chunks': chunks,
+        'elapsed_seconds': round(elapsed, 2),
+        'rows_per_second': round(rows_per_second, 1)
+    }
+
+def cleanup_task_tombstones(now=None):
+    """Xóa tombstone cũ hơn TASK_TOMBSTONE_RETENTION_DAYS theo từng lô (cùng cỡ lô / thời gian nghỉ
+    với job dọn notifications)
+
+    Mốc xóa lấy từ tombstone_cutoff, cũng là mốc /api/tasks/changes trả 410 cho cursor cũ.
+    """
+    from flask import current_app
+    from models.task_tombstone import TaskTombstone
+    from database import db
+    from utils.task_sync import tombstone_cutoff
+
+    started = time.perf_counter()
+    config = current_app.config
+    batch_size = config.get('NOTIFICATION_CLEANUP_BATCH_SIZE', 5000)
+    pause = config.get('NOTIFICATION_CLEANUP_PAUSE_SECONDS', 0.2)
+    table = TaskTombstone.__table__
+    cutoff = tombstone_cutoff(config, now)
+
+    deleted = 0
+    chunks = 0
+    try:
+        while True:
+            count = _delete_chunk(table, (table.c.deleted_at < cutoff,), batch_size)
+            db.session.commit()
+            chunks += 1
+            deleted += count
+            if count < batch_size:
+                break
+            time.sleep(pause)
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error cleaning up task tombstones: {e}")
+        return None
+
+    elapsed = time.perf_counter() - started
+    print(f"🧹 Cleaned up {deleted} task tombstones older than {cutoff:%Y-%m-%d %H:%M} in {chunks} chunks, {elapsed:.1f}s")
+    return {'deleted': deleted, 'chunks': chunks, 'elapsed_seconds': round(elapsed, 2)}
+
+# Watermark của job quét deadline trong bảng scheduler_state
+DEADLINE_CHECK_JOB = 'deadline_check'
+# Task được nhắc "sắp đến hạn" khi deadline còn trong khoảng này
+DEADLINE_SOON_WINDOW = timedelta(days=1)
+# Quét lùi thêm 1 chút so với watermark (updated_at chỉ chính xác tới giây, job chạy chồng),
+# task đã nhắc được bỏ qua nhờ anti-join nên quét trùng không gửi lại
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+def _deadline_candidates(*criteria):
+    """Query task mở (todo/doing) có assignee thỏa criteria (chưa lọc task đã được nhắc)"""
+    from database import db
+
+    return db.session.query(Task.id, Task.title, Task.assignee_id).filter(
+        *criteria,
+        Task.status.in_(['todo', 'doing']),
+        Task.assignee_id.isnot(None)
+    )
+
+def _already_notified(notification_type, since):
+    """EXISTS: assignee của task đã có notification loại này từ since
+
+    Chạy trong DB (index ix_notifications_task_type_created) thay vì 1 query kiểm tra cho mỗi task.
+    """
+    from models.notification import Notification
+    from database import db
+
+    return db.session.query(Notification.id).filter(
+        Notification.task_id == Task.id,
+        Notification.user_id == Task.assignee_id,
+        Notification.type == notification_type,
+        Notification.created_at >= since
+    ).exists()
+
+def _tasks_without_notification(notification_type, since, *criteria):
+    """Task ứng viên (_deadline_candidates) chưa có notification loại này từ since"""
+    return _deadline_candidates(*criteria).filter(~_already_notified(notification_type, since))
+
+def _candidates_with_flag(notification_type, since, *criteria):
+    """Task ứng viên kèm cột notified (đã được nhắc chưa)
+
+    Trả về cả task đã nhắc để biết số dòng đã đọc mà không cần thêm 1 query COUNT.
+    """
+    return _deadline_candidates(*criteria).add_columns(
+        _already_notified(notification_type, since).label('notified')
+    )
+
+def _deadline_notification_rows(upcoming_tasks, overdue_tasks, now):
+    """Dòng notifications cho task sắp đến hạn / quá hạn, dùng với bulk_insert"""
+    return [{
+        'user_id': task.assignee_id,
+        'title': f"Task deadline approaching: {task.title}",
+        'message': f"Task '{task.title}' is due within 24 hours",
+        'type': NotificationType.TASK_DEADLINE_SOON,
+        'task_id': task.id,
+        'is_important': True,
+        'created_at': now
+    } for task in upcoming_tasks] + [{
+        'user_id': task.assignee_id,
+        'title': f"Task overdue: {task.title}",
+        'message': f"Task '{task.title}' is overdue",
+        'type': NotificationType.TASK_OVERDUE,
+        'task_id': task.id,
+        'is_important': True,
+        'created_at': now
+    } for task in overdue_tasks]
+
+def notify_deadline_tasks(soon_ids, overdue_ids, now=None):
+    """Gửi nhắc cho các task mà timer báo vừa tới ngưỡng (utils/deadline_timers.py)
+
+    DB vẫn là nguồn chính: task phải còn mở, có assignee, deadline còn đúng ngưỡng và
+    chưa được nhắc (cùng điều kiện với check_task_deadlines) thì mới gửi.
+    Trả về (số nhắc sắp đến hạn, số nhắc quá hạn).
+    """
+    from models.notification import Notification
+    from database import db
+    from utils.bulk_insert import bulk_insert
+
+    now = now or datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    upcoming_tasks = _tasks_without_notification(
+        NotificationType.TASK_DEADLINE_SOON, now - DEADLINE_SOON_WINDOW,
+        Task.id.in_(soon_ids), Task.deadline <= now + DEADLINE_SOON_WINDOW, Task.deadline > now
+    ).all() if soon_ids else []
+    overdue_tasks = _tasks_without_notification(
+        NotificationType.TASK_OVERDUE, today_start,
+        Task.id.in_(overdue_ids), Task.deadline <= now
+    ).all() if overdue_ids else []
+
+    try:
+        bulk_insert(Notification.__table__, _deadline_notification_rows(upcoming_tasks, overdue_tasks, now))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(upcoming_tasks), len(overdue_tasks)
+
+def check_task_deadlines(now=None):
+    """Check for tasks approaching deadline and overdue tasks
+
+    Chỉ xét các task có deadline vượt ngưỡng (còn 24h / quá hạn) hoặc được sửa từ lần quét
+    trước (watermark trong scheduler_state); lần chạy đầu tiên quét toàn bộ.
+    "Sắp đến hạn" được nhắc tối đa 1 lần mỗi 24h, "quá hạn" 1 lần mỗi ngày: lần quét đầu
+    tiên của ngày mới xét lại tất cả task quá hạn.
+    Notifications được insert bằng 1 INSERT nhiều dòng, commit cùng watermark mới.
+    """
+    from models.notification import Notification
+    from models.scheduler_state import get_watermark, set_watermark
+    from database import db
+    from utils.bulk_insert import bulk_insert
+
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    tomorrow = now + DEADLINE_SOON_WINDOW
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    try:
+        last_scan = get_watermark(DEADLINE_CHECK_JOB)
+        if last_scan is not None and last_scan > now:
+            # Đồng hồ bị lùi: quét lại toàn bộ cho an toàn
+            last_scan = None
+        since = last_scan - WATERMARK_OVERLAP if last_scan else None
+
+        # Tasks due within 24 hours: deadline vừa vào cửa sổ 24h hoặc task vừa được sửa
+        soon_criteria = [Task.deadline <= tomorrow, Task.deadline > now]
+        if since:
+            soon_criteria.append(db.or_(Task.deadline > since + DEADLINE_SOON_WINDOW, Task.updated_at > since))
+        soon_rows = _candidates_with_flag(
+            NotificationType.TASK_DEADLINE_SOON, now - DEADLINE_SOON_WINDOW, *soon_criteria
+        ).all()
+
+        # Overdue tasks: ngày mới thì xét tất cả, còn lại chỉ task vừa quá hạn hoặc vừa được sửa.
+        # Tách 2 query (UNION) để mỗi nhánh dùng được index deadline / updated_at
+        if since is None or last_scan < today_start:
+            overdue_branches = [(Task.deadline < now,)]
+        else:
+            overdue_branches = [
+                (Task.deadline < now, Task.deadline >= since),
+                (Task.deadline < now, Task.updated_at > since)
+            ]
+        overdue_query = _candidates_with_flag(NotificationType.TASK_OVERDUE, today_start, *overdue_branches[0])
+        for branch in overdue_branches[1:]:
+            overdue_query = overdue_query.union(
+                _candidates_with_flag(NotificationType.TASK_OVERDUE, today_start, *branch)
             )
-    
-    # Overdue tasks
-    overdue_tasks = Task.query.filter(
-        Task.deadline < now,
-        Task.status.in_(['todo', 'doing'])
-    ).all()
-    
-    for task in overdue_tasks:
-        if task.assignee_id:
-            # Check if we haven't already sent overdue notification today
-            from models.notification import Notification
-            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            existing_notification = Notification.query.filter(
-                Notification.user_id == task.assignee_id,
-                Notification.task_id == task.id,
-                Notification.type == NotificationType.TASK_OVERDUE,
-                Notification.created_at >= today_start
-            ).first()
-            
-            if not existing_notification:
-                create_notification(
-                    user_id=task.assignee_id,
-                    title=f"Task overdue: {task.title}",
-                    message=f"Task '{task.title}' is overdue",
-                    notification_type=NotificationType.TASK_OVERDUE,
-                    task_id=task.id,
-                    is_important=True
-                )
\ No newline at end of file
+        overdue_rows = overdue_query.all()
+
+        # Số task đọc được trước khi bỏ các task đã nhắc: cho thấy incremental quét ít hơn full
+        rows_scanned = len(soon_rows) + len(overdue_rows)
+        upcoming_tasks = [task for task in soon_rows if not task.notified]
+        overdue_tasks = [task for task in overdue_rows if not task.notified]
+
+        rows = _deadline_notification_rows(upcoming_tasks, overdue_tasks, now)
+
+        bulk_insert(Notification.__table__, rows)
+        set_watermark(DEADLINE_CHECK_JOB, now)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error checking task deadlines: {e}")
+        return None
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    mode = 'full' if since is None else 'incremental'
+    print(
+        f"⏰ Deadline check ({mode}): {rows_scanned} rows scanned, "
+        f"{len(upcoming_tasks)} due soon, {len(overdue_tasks)} overdue notified in {elapsed_ms:.1f}ms"
+    )
+    return {
+        'mode': mode,
+        'rows_scanned': rows_scanned,
+        'notifications_created': len(rows),
+        'deadline_soon': len(upcoming_tasks),
+        'overdue': len(overdue_tasks),
+        'elapsed_ms': round(elapsed_ms, 2)
+    }
@@ -0,0 +1,70 @@
+# utils/notifications.py - Tạo nhiều notification bằng 1 INSERT nhiều dòng
+#
+# create_notifications(..., defer=True) không ghi ngay mà đưa vào session.info, các dòng
+# được INSERT trong before_commit nên commit cùng transaction với dữ liệu của caller
+# (rollback thì bỏ). Không dùng defer thì INSERT + commit riêng như create_notification.
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import db
+from models.notification import Notification
+from utils.bulk_insert import bulk_insert
+
+
+def notification_row(user_id, title, message, notification_type, **refs):
+    """Dòng notifications cho bulk_insert, refs: task_id / group_id / report_id / is_important"""
+    return {
+        'user_id': user_id,
+        'title': title,
+        'message': message,
+        'type': notification_type,
+        'task_id': refs.get('task_id'),
+        'group_id': refs.get('group_id'),
+        'report_id': refs.get('report_id'),
+        'is_important': refs.get('is_important', False),
+        'created_at': refs.get('created_at') or datetime.utcnow()
+    }
+
+
+def create_notifications(notifications, defer=False):
+    """Tạo nhiều notification bằng 1 INSERT nhiều dòng
+
+    notifications: các tuple (user_id, title, message, notification_type[, refs]) với refs là
+    dict task_id / group_id / report_id / is_important.
+    defer=True: chờ tới commit tiếp theo của db.session (cùng transaction với caller),
+    trả về số notification đã xếp hàng. Ngược lại INSERT + commit ngay, trả về list ID.
+    """
+    rows = [notification_row(*item[:4], **(item[4] if len(item) > 4 else {})) for item in notifications]
+    if defer:
+        session = db.session()
+        if not session.in_transaction():
+            # Để rollback() trước commit luôn chạy event và bỏ hàng đợi
+            session.begin()
+        _pending_rows(session).extend(rows)
+        return len(rows)
+
+    try:
+        ids = bulk_insert(Notification.__table__, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return ids
+
+
+def _pending_rows(session):
+    return session.info.setdefault('pending_notifications', [])
+
+
+@event.listens_for(Session, 'before_commit')
+def _insert_pending(session):
+    rows = session.info.pop('pending_notifications', None)
+    if rows:
+        bulk_insert(Notification.__table__, rows)
+
+
+# after_soft_rollback chạy cả khi transaction chưa gửi câu lệnh nào (after_rollback thì không)
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('pending_notifications', None)
@@ -0,0 +1,85 @@
+# utils/pagination.py - Keyset (cursor) pagination theo (created_at, id)
+import base64
+import json
+from datetime import datetime
+from database import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# total=estimate chỉ đếm tối đa chừng này dòng
+TOTAL_ESTIMATE_CAP = 10000
+
+
+def wants_pagination(args):
+    """Chỉ phân trang khi client gửi limit hoặc cursor (giữ tương thích API cũ)"""
+    return 'limit' in args or 'cursor' in args
+
+
+def encode_cursor(created_at, row_id):
+    """Mã hóa vị trí (created_at, id) thành chuỗi opaque"""
+    payload = json.dumps([created_at.strftime('%Y-%m-%d %H:%M:%S.%f') if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Giải mã cursor, raise ValueError nếu cursor không hợp lệ"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        created_at = datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S.%f') if created_at else None
+        return created_at, int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_page_args(args):
+    """Đọc limit/cursor/total từ query string, raise ValueError nếu sai"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('Invalid limit')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = args.get('cursor')
+    position = decode_cursor(cursor) if cursor else None
+
+    total = args.get('total')  # exact | estimate
+    if total and total not in ('exact', 'estimate'):
+        raise ValueError('Invalid total. Must be exact or estimate')
+
+    return limit, position, total
+
+
+def keyset_paginate(query, model, limit, position=None, total=None):
+    """Lấy 1 trang theo thứ tự (created_at desc, id desc)
+
+    Trả về (items, page_info). Chi phí chỉ phụ thuộc limit, không phụ thuộc
+    số dòng đã bỏ qua như OFFSET.
+    """
+    page_info = {'limit': limit, 'next_cursor': None, 'has_more': False}
+
+    if total == 'exact':
+        page_info['total_count'] = query.order_by(None).count()
+        page_info['total_is_estimate'] = False
+    elif total == 'estimate':
+        capped = query.order_by(None).with_entities(model.id).limit(TOTAL_ESTIMATE_CAP + 1).subquery()
+        count = db.session.query(db.func.count()).select_from(capped).scalar()
+        page_info['total_count'] = min(count, TOTAL_ESTIMATE_CAP)
+        page_info['total_is_estimate'] = count > TOTAL_ESTIMATE_CAP
+
+    if position:
+        created_at, row_id = position
+        query = query.filter(db.or_(
+            model.created_at < created_at,
+            db.and_(model.created_at == created_at, model.id < row_id)
+        ))
+
+    # Lấy dư 1 dòng để biết còn trang sau hay không
+    items = query.order_by(None).order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        page_info['has_more'] = True
+        page_info['next_cursor'] = encode_cursor(last.created_at, last.id)
+
+    return items, page_info
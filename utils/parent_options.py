@@ -0,0 +1,67 @@
+# utils/parent_options.py - Cache danh sách parent task cho form tạo task
+#
+# Key: (group_id, status set, assignee_id, limit), value: (ETag, kết quả). Route chỉ dùng entry
+# khi ETag (version tasks + users) còn khớp nên thay đổi từ worker khác cũng được thấy ngay.
+# Khi task của 1 nhóm thay đổi, các entry của nhóm đó (và entry không lọc nhóm) bị xóa sau
+# khi transaction commit để giải phóng sớm.
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from models.task import Task
+from models.user import User
+from utils.cache import TTLCache
+
+parent_options_cache = TTLCache(maxsize=512)
+
+# Đánh dấu xóa toàn bộ cache (vd: đổi tên user làm sai tên assignee đã cache)
+ALL_GROUPS = '*'
+
+
+def parent_options_key(group_id, statuses, assignee_id, limit):
+    return (group_id, frozenset(statuses), assignee_id, limit)
+
+
+def _pending_groups(session):
+    return session.info.setdefault('parent_options_groups', set())
+
+
+def queue_parent_options_invalidation(session, group_ids):
+    """Xóa cache của các nhóm sau commit, dùng cho task ghi bằng Core (không qua mapper event)"""
+    _pending_groups(session).update(group_ids)
+
+
+def _old_group_id(target):
+    history = inspect(target).attrs.group_id.history
+    return history.deleted[0] if history.deleted else target.group_id
+
+
+@event.listens_for(Task, 'after_insert')
+@event.listens_for(Task, 'after_update')
+@event.listens_for(Task, 'after_delete')
+def _queue_task_groups(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        queue_parent_options_invalidation(session, {_old_group_id(target), target.group_id})
+
+
+@event.listens_for(User, 'after_update')
+def _queue_user_rename(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and inspect(target).attrs.name.history.has_changes():
+        queue_parent_options_invalidation(session, {ALL_GROUPS})
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidation(session):
+    group_ids = session.info.pop('parent_options_groups', None)
+    if not group_ids:
+        return
+    if ALL_GROUPS in group_ids:
+        parent_options_cache.invalidate()
+    else:
+        # Entry không lọc theo nhóm (group_id None) chứa task của mọi nhóm
+        parent_options_cache.invalidate(lambda key: key[0] is None or key[0] in group_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidation(session):
+    session.info.pop('parent_options_groups', None)
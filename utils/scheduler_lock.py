@@ -0,0 +1,101 @@
+# utils/scheduler_lock.py - Chọn 1 process duy nhất chạy các job định kỳ
+#
+# Mỗi worker (gunicorn, nhiều container) đều khởi động scheduler nhưng chỉ process giữ
+# khóa mới chạy job. MySQL: GET_LOCK trên 1 connection riêng, MySQL tự nhả khóa khi
+# connection chết nên process khác lấy được ở lần thử sau. DB khác (SQLite, chạy 1 máy):
+# flock trên file, hệ điều hành nhả khóa khi process chết.
+import os
+from sqlalchemy import text
+from database import db
+
+
+class SchedulerLock:
+    """Khóa leader không chờ: acquire() trả về True nếu process này giữ khóa"""
+
+    def __init__(self, name, lock_file):
+        self.name = name
+        self.lock_file = lock_file
+        self._connection = None
+        self._file = None
+
+    @property
+    def held(self):
+        return self._connection is not None or self._file is not None
+
+    def acquire(self):
+        if self.held:
+            return True
+        if db.engine.dialect.name == 'mysql':
+            return self._acquire_mysql()
+        return self._acquire_file()
+
+    def still_held(self):
+        """Kiểm tra khóa còn hiệu lực (connection giữ GET_LOCK có thể đã bị MySQL ngắt)
+
+        Gọi định kỳ cũng giữ cho connection không bị wait_timeout đóng.
+        """
+        if self._connection is None:
+            return self._file is not None
+        try:
+            owner, me = self._connection.execute(
+                text('SELECT IS_USED_LOCK(:name), CONNECTION_ID()'), {'name': self.name}
+            ).one()
+            if owner == me:
+                return True
+        except Exception as e:
+            print(f"⚠️ Scheduler lock connection lost: {e}")
+        self._close_connection()
+        return False
+
+    def release(self):
+        if self._connection is not None:
+            try:
+                self._connection.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': self.name})
+            except Exception:
+                pass
+            self._close_connection()
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def _acquire_mysql(self):
+        # Connection riêng, autocommit để không giữ transaction mở suốt thời gian làm leader
+        connection = db.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        try:
+            acquired = connection.execute(text('SELECT GET_LOCK(:name, 0)'), {'name': self.name}).scalar()
+        except Exception:
+            connection.close()
+            raise
+        if acquired == 1:
+            self._connection = connection
+            return True
+        connection.close()
+        return False
+
+    def _acquire_file(self):
+        import fcntl
+        directory = os.path.dirname(self.lock_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_file, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f'{os.getpid()}\n')
+        lock_file.flush()
+        self._file = lock_file
+        return True
+
+    def _close_connection(self):
+        try:
+            self._connection.invalidate()
+            self._connection.close()
+        except Exception:
+            pass
+        self._connection = None
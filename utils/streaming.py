@@ -0,0 +1,58 @@
+# utils/streaming.py - Trả danh sách lớn dạng stream (JSON array / NDJSON)
+#
+# Rows được đọc bằng server-side cursor (yield_per) và serialize từng lô nên bộ nhớ
+# không tăng theo số dòng. Trong lúc stream, connection đang bận đọc cursor: mọi dữ
+# liệu liên quan phải có sẵn trong cùng SELECT (joinedload / subquery), không lazy load.
+from itertools import islice
+from flask import Response, current_app, stream_with_context
+
+STREAM_BATCH_SIZE = 500
+STREAM_MODES = ('json', 'ndjson')
+
+
+def get_stream_mode(args):
+    """Đọc stream=json|ndjson từ query string, raise ValueError nếu không hợp lệ"""
+    mode = args.get('stream')
+    if not mode:
+        return None
+    if mode not in STREAM_MODES:
+        raise ValueError('Invalid stream mode. Use json or ndjson')
+    if 'limit' in args or 'cursor' in args:
+        raise ValueError('stream cannot be combined with limit/cursor')
+    return mode
+
+
+def stream_response(query, serialize, mode, key=None, summary=None, batch_size=STREAM_BATCH_SIZE):
+    """Stream kết quả của query, serialize(row) trả về dict cho từng dòng
+
+    json: [item, ...] hoặc {key: [item, ...], **summary()} khi có key.
+    ndjson: mỗi dòng 1 item, không có summary.
+    summary được gọi sau khi đã stream hết rows (vd: tổng số / tổng dung lượng).
+    """
+    dumps = current_app.json.dumps
+    rows = iter(query.yield_per(batch_size))
+
+    def generate():
+        if mode == 'ndjson':
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    return
+                yield ''.join(dumps(serialize(row)) + '\n' for row in batch)
+
+        yield f'{{{dumps(key)}:[' if key else '['
+        separator = ''
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            yield separator + ','.join(dumps(serialize(row)) for row in batch)
+            separator = ','
+        yield ']'
+        if key:
+            for name, value in (summary() if summary else {}).items():
+                yield f',{dumps(name)}:{dumps(value)}'
+            yield '}'
+
+    mimetype = 'application/x-ndjson' if mode == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
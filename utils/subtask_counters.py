@@ -0,0 +1,126 @@
+# utils/subtask_counters.py - Giữ Task.subtasks_total / subtasks_done đồng bộ khi ghi
+from collections import defaultdict
+from sqlalchemy import event, inspect, bindparam, update
+from sqlalchemy.orm import Session, object_session, aliased
+from database import db
+from models.task import Task
+
+
+def _deltas(session):
+    return session.info.setdefault('subtask_counter_deltas', defaultdict(lambda: [0, 0]))
+
+
+def _old_value(target, attr):
+    """Giá trị trước khi flush của 1 attribute"""
+    history = inspect(target).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(target, attr)
+
+
+def add_subtask_delta(session, parent_id, total, done):
+    """Ghi nhận thay đổi số subtasks của parent, áp dụng ở cuối flush"""
+    if parent_id:
+        delta = _deltas(session)[parent_id]
+        delta[0] += total
+        delta[1] += done
+
+
+@event.listens_for(Task, 'after_insert')
+def _on_insert(mapper, connection, target):
+    add_subtask_delta(object_session(target), target.parent_task_id, 1, int(target.status == 'done'))
+
+
+@event.listens_for(Task, 'after_update')
+def _on_update(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.status.history.has_changes() or state.attrs.parent_task_id.history.has_changes()):
+        return
+    session = object_session(target)
+    old_parent = _old_value(target, 'parent_task_id')
+    old_done = int(_old_value(target, 'status') == 'done')
+    add_subtask_delta(session, old_parent, -1, -old_done)
+    add_subtask_delta(session, target.parent_task_id, 1, int(target.status == 'done'))
+
+
+@event.listens_for(Task, 'after_delete')
+def _on_delete(mapper, connection, target):
+    add_subtask_delta(
+        object_session(target),
+        _old_value(target, 'parent_task_id'),
+        -1,
+        -int(_old_value(target, 'status') == 'done')
+    )
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _apply_deltas(session, flush_context):
+    deltas = session.info.pop('subtask_counter_deltas', None)
+    if not deltas:
+        return
+    apply_subtask_deltas(session, deltas)
+
+
+def apply_subtask_deltas(session, deltas):
+    """UPDATE tasks SET subtasks_total = subtasks_total + delta ... trong transaction hiện tại
+
+    Dùng cộng dồn thay vì đếm lại để 2 transaction cùng thêm subtask
+    cho 1 parent không ghi đè kết quả của nhau.
+    """
+    params = [
+        {'parent_id': parent_id, 'd_total': d_total, 'd_done': d_done}
+        for parent_id, (d_total, d_done) in deltas.items()
+        if d_total or d_done
+    ]
+    if not params:
+        return
+    table = Task.__table__
+    session.connection().execute(
+        update(table)
+        .where(table.c.id == bindparam('parent_id'))
+        .values(
+            subtasks_total=table.c.subtasks_total + bindparam('d_total'),
+            subtasks_done=table.c.subtasks_done + bindparam('d_done')
+        ),
+        params
+    )
+    # Object parent đang load trong session phải đọc lại giá trị mới
+    for row in params:
+        parent = session.identity_map.get(inspect(Task).identity_key_from_primary_key((row['parent_id'],)))
+        if parent is not None:
+            session.expire(parent, ['subtasks_total', 'subtasks_done'])
+
+
+def repair_subtask_counters(batch_size=1000):
+    """Đếm lại subtasks_total / subtasks_done cho toàn bộ bảng tasks
+
+    Chỉ UPDATE những dòng bị lệch; trả về số dòng đã sửa. updated_at của các dòng đó được
+    cập nhật (onupdate) để ETag / delta-sync trả progress đã sửa cho client.
+    """
+    child = aliased(Task)
+    counts = db.session.query(
+        child.parent_task_id.label('parent_id'),
+        db.func.count(child.id).label('total'),
+        db.func.sum(db.case((child.status == 'done', 1), else_=0)).label('done')
+    ).filter(child.parent_task_id.isnot(None)).group_by(child.parent_task_id).subquery()
+
+    total = db.func.coalesce(counts.c.total, 0)
+    done = db.func.coalesce(counts.c.done, 0)
+    rows = db.session.query(Task.id, total, done).outerjoin(
+        counts, counts.c.parent_id == Task.id
+    ).filter(db.or_(Task.subtasks_total != total, Task.subtasks_done != done)).all()
+
+    table = Task.__table__
+    stmt = update(table).where(table.c.id == bindparam('task_id')).values(
+        subtasks_total=bindparam('total'),
+        subtasks_done=bindparam('done')
+    )
+    for i in range(0, len(rows), batch_size):
+        db.session.execute(stmt, [
+            {'task_id': task_id, 'total': int(t), 'done': int(d)}
+            for task_id, t, d in rows[i:i + batch_size]
+        ])
+    db.session.commit()
+    return len(rows)
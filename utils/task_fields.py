@@ -0,0 +1,70 @@
+# utils/task_fields.py - Sparse fieldsets (fields=) và chọn object lồng nhau (embed=) cho task JSON
+from sqlalchemy.orm import joinedload, defer
+from models.task import Task
+
+# Các object lồng nhau có thể embed bằng joinedload (assigner/assignee là backref từ User
+# nên chỉ lấy attribute trên Task lúc tạo query)
+TASK_RELATIONSHIPS = ('assigner', 'assignee', 'group', 'parent_task')
+
+
+def _parse_list(value):
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+
+class TaskFields:
+    """Các key client yêu cầu cho mỗi task
+
+    fields=None nghĩa là tất cả; embeds là các object lồng nhau được load.
+    'id' luôn có trong kết quả.
+    """
+
+    def __init__(self, fields=None, embeds=frozenset(), available_embeds=frozenset()):
+        self.fields = fields
+        self.embeds = embeds
+        self.available_embeds = available_embeds
+
+    def wants(self, key):
+        if self.fields is not None and key not in self.fields and key != 'id':
+            return False
+        if key in self.available_embeds and key not in self.embeds:
+            return False
+        return True
+
+    def query_options(self):
+        """joinedload chỉ các object được embed, bỏ đọc description nếu không cần"""
+        options = [
+            joinedload(getattr(Task, name))
+            for name in TASK_RELATIONSHIPS
+            if name in self.available_embeds and self.wants(name)
+        ]
+        if not self.wants('description'):
+            options.append(defer(Task.description))
+        return options
+
+    def pick(self, item):
+        """Bỏ các key không được yêu cầu khỏi dict đã build"""
+        if self.fields is None:
+            return item
+        return {key: value for key, value in item.items() if self.wants(key)}
+
+
+def parse_task_fields(args, available_embeds):
+    """Đọc fields= / embed= từ query string, raise ValueError nếu embed không hợp lệ
+
+    Không có embed= thì embed tất cả như response cũ; embed= rỗng thì không embed gì.
+    """
+    available_embeds = frozenset(available_embeds)
+    fields = _parse_list(args['fields']) if args.get('fields') else None
+
+    if 'embed' in args:
+        embeds = _parse_list(args['embed'])
+        unknown = embeds - available_embeds
+        if unknown:
+            raise ValueError(
+                f"Unknown embed: {', '.join(sorted(unknown))}. "
+                f"Available: {', '.join(sorted(available_embeds))}"
+            )
+    else:
+        embeds = available_embeds
+
+    return TaskFields(fields, frozenset(embeds), available_embeds)
@@ -0,0 +1,217 @@
+# utils/task_import.py - Đọc và kiểm tra file import tasks (CSV / NDJSON)
+#
+# File được đọc từng dòng từ stream upload, không load cả file vào bộ nhớ.
+# Assignee / group / parent được kiểm tra bằng các tập ID load sẵn 1 lần cho cả file
+# thay vì 1 query cho mỗi dòng.
+import csv
+import io
+import json
+from datetime import datetime
+from database import db
+from models.task import Task
+from models.user import User
+from models.group import Group
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_COLUMNS = ('title', 'description', 'status', 'priority', 'deadline',
+                  'assignee_id', 'group_id', 'parent_task_id')
+TASK_STATUSES = ('todo', 'doing', 'done')
+TASK_PRIORITIES = ('low', 'medium', 'high')
+DEADLINE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+TITLE_MAX_LENGTH = 255
+
+
+def detect_import_format(explicit, filename, mimetype):
+    """format= trên query string, hoặc đoán từ tên file / content type"""
+    if explicit:
+        if explicit not in IMPORT_FORMATS:
+            raise ValueError('Invalid format. Use csv or ndjson')
+        return explicit
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (mimetype or ''):
+        return 'ndjson'
+    if name.endswith('.csv') or 'csv' in (mimetype or ''):
+        return 'csv'
+    raise ValueError('Cannot detect file format, pass format=csv or format=ndjson')
+
+
+def iter_import_records(stream, fmt):
+    """Trả về iterator (số dòng, dict, lỗi) cho từng bản ghi của file
+
+    Với CSV, dòng đầu là header và được kiểm tra ngay (ValueError nếu sai).
+    Dòng trống được bỏ qua; file không đọc được (sai encoding, CSV hỏng) raise ValueError
+    trong lúc duyệt.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            columns = reader.fieldnames or []
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ValueError(f'Cannot read file: {e}')
+        if 'title' not in columns:
+            raise ValueError('CSV header must include a title column')
+        unknown = set(columns) - set(IMPORT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        return _read_errors_as_value_error(_csv_records(reader))
+
+    return _read_errors_as_value_error(_ndjson_records(text))
+
+
+def _read_errors_as_value_error(records):
+    try:
+        yield from records
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ValueError(f'Cannot read file: {e}')
+
+
+def _csv_records(reader):
+    for record in reader:
+        if not any(record.values()):
+            continue
+        if None in record:
+            yield reader.line_num, None, 'Too many columns'
+            continue
+        yield reader.line_num, record, None
+
+
+def _ndjson_records(text):
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Each line must be a JSON object'
+            continue
+        yield line_number, record, None
+
+
+class ImportLookups:
+    """Các tập ID dùng để kiểm tra khóa ngoại
+
+    users / groups load 1 lần cho cả file; task cha chỉ load các ID được tham chiếu
+    trong từng lô (preload_parents) thay vì toàn bộ bảng tasks.
+    """
+
+    def __init__(self):
+        self.user_groups = dict(db.session.query(User.id, User.group_id))
+        self.group_ids = {group_id for (group_id,) in db.session.query(Group.id)}
+        self.task_ids = set()
+
+    def preload_parents(self, records):
+        """Load các parent_task_id mà lô tham chiếu bằng 1 query Task.id IN (...)
+
+        Giá trị không phải số bỏ qua ở đây, validate_import_record sẽ báo lỗi.
+        """
+        parent_ids = set()
+        for record in records:
+            try:
+                parent_id = _as_id(_clean(record.get('parent_task_id')))
+            except (TypeError, ValueError):
+                continue
+            if parent_id is not None:
+                parent_ids.add(parent_id)
+        self.task_ids = {
+            task_id for (task_id,) in db.session.query(Task.id).filter(Task.id.in_(parent_ids))
+        } if parent_ids else set()
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _as_id(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError
+    return int(value)
+
+
+def _parse_deadline(value):
+    for fmt in DEADLINE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError
+
+
+def validate_import_record(record, lookups, led_group_id=None):
+    """Chuyển 1 bản ghi thành giá trị cột của tasks
+
+    Trả về (values, errors); values là None nếu có lỗi.
+    led_group_id: nhóm của leader import, assignee / group phải thuộc nhóm này.
+    """
+    record = {key: _clean(record.get(key)) for key in IMPORT_COLUMNS}
+    errors = []
+
+    title = record['title']
+    if not title:
+        errors.append('Missing title')
+    elif not isinstance(title, str) or len(title) > TITLE_MAX_LENGTH:
+        errors.append(f'Title must be a string of at most {TITLE_MAX_LENGTH} characters')
+    if record['description'] is not None and not isinstance(record['description'], str):
+        errors.append('Description must be a string')
+
+    status = record['status'] or 'todo'
+    if status not in TASK_STATUSES:
+        errors.append('Invalid status. Must be todo, doing, or done')
+
+    priority = record['priority'] or 'medium'
+    if priority not in TASK_PRIORITIES:
+        errors.append('Invalid priority. Must be low, medium, or high')
+
+    deadline = None
+    if record['deadline']:
+        try:
+            deadline = _parse_deadline(str(record['deadline']))
+        except ValueError:
+            errors.append('Invalid deadline format. Use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS')
+
+    ids = {}
+    for key in ('assignee_id', 'group_id', 'parent_task_id'):
+        try:
+            ids[key] = _as_id(record[key])
+        except (TypeError, ValueError):
+            errors.append(f'{key} must be an integer')
+            ids[key] = None
+
+    assignee_id, group_id, parent_task_id = ids['assignee_id'], ids['group_id'], ids['parent_task_id']
+    if assignee_id is not None and assignee_id not in lookups.user_groups:
+        errors.append(f'Assignee with ID {assignee_id} not found')
+    if group_id is not None and group_id not in lookups.group_ids:
+        errors.append(f'Group with ID {group_id} not found')
+    if parent_task_id is not None and parent_task_id not in lookups.task_ids:
+        errors.append(f'Parent task with ID {parent_task_id} not found')
+
+    if led_group_id is not None:
+        if group_id is not None and group_id != led_group_id:
+            errors.append('You can only assign tasks within your group')
+        if assignee_id in lookups.user_groups and lookups.user_groups[assignee_id] != led_group_id:
+            errors.append(f'User {assignee_id} is not in your group')
+
+    if errors:
+        return None, errors
+
+    return {
+        'title': title,
+        'description': record['description'],
+        'status': status,
+        'priority': priority,
+        'deadline': deadline,
+        'assignee_id': assignee_id,
+        'group_id': group_id,
+        'parent_task_id': parent_task_id
+    }, []
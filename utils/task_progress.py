@@ -0,0 +1,85 @@
+# utils/task_progress.py - Tính progress cho nhiều task bằng 1 query GROUP BY
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from database import db
+from models.task import Task
+
+# Giới hạn độ sâu khi duyệt cây subtasks (chống vòng lặp parent_task_id)
+MAX_TREE_DEPTH = 20
+
+
+def progress_from_counts(status, subtasks_total, subtasks_done):
+    """Tính progress từ status và số subtasks (tổng, done)"""
+    if status == 'done':
+        return 100
+    elif status == 'doing':
+        if subtasks_total:
+            return int((subtasks_done / subtasks_total) * 100)
+        else:
+            return 50  # Default for "doing" without subtasks
+    else:  # todo
+        return 0
+
+
+def get_subtask_stats(parent_ids, deep=False):
+    """Đếm (tổng, done) subtasks cho nhiều parent task trong 1 query GROUP BY
+
+    parent_ids có thể là list ID hoặc 1 query chọn Task.id.
+    deep=True đếm toàn bộ con cháu (mọi cấp) bằng 1 recursive CTE.
+    """
+    if isinstance(parent_ids, (list, tuple, set)):
+        if not parent_ids:
+            return {}
+        parent_ids = list(parent_ids)
+    else:
+        parent_ids = parent_ids.order_by(None).scalar_subquery()
+
+    done = db.func.sum(db.case((Task.status == 'done', 1), else_=0))
+    if not deep:
+        rows = db.session.query(
+            Task.parent_task_id,
+            db.func.count(Task.id),
+            done
+        ).filter(
+            Task.parent_task_id.in_(parent_ids)
+        ).group_by(Task.parent_task_id).all()
+    else:
+        tree = select(
+            Task.parent_task_id.label('root_id'),
+            Task.id.label('id'),
+            Task.status.label('status'),
+            db.literal(1).label('depth')
+        ).where(Task.parent_task_id.in_(parent_ids)).cte('subtask_tree', recursive=True)
+        child = aliased(Task)
+        tree = tree.union_all(
+            select(tree.c.root_id, child.id, child.status, tree.c.depth + 1)
+            .join(child, child.parent_task_id == tree.c.id)
+            .where(tree.c.depth < MAX_TREE_DEPTH)
+        )
+        rows = db.session.query(
+            tree.c.root_id,
+            db.func.count(tree.c.id),
+            db.func.sum(db.case((tree.c.status == 'done', 1), else_=0))
+        ).group_by(tree.c.root_id).all()
+
+    return {parent_id: (total, int(done_count or 0)) for parent_id, total, done_count in rows}
+
+
+def get_progress_map(tasks, deep=False, subtask_stats=None):
+    """Tính progress cho cả 1 trang tasks, trả về {task_id: progress}
+
+    Mặc định dùng counter subtasks_total/subtasks_done có sẵn trên Task nên
+    không query thêm; deep=True cần 1 recursive CTE cho cả trang.
+    """
+    if subtask_stats is None:
+        if deep:
+            # Task không ở trạng thái doing không cần đếm subtasks
+            doing_ids = [task.id for task in tasks if task.status == 'doing']
+            subtask_stats = get_subtask_stats(doing_ids, deep=True)
+        else:
+            subtask_stats = {task.id: (task.subtasks_total, task.subtasks_done) for task in tasks}
+
+    return {
+        task.id: progress_from_counts(task.status, *subtask_stats.get(task.id, (0, 0)))
+        for task in tasks
+    }
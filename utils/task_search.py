@@ -0,0 +1,248 @@
+# utils/task_search.py - Tìm kiếm full-text theo title + description của task
+import base64
+import bisect
+import json
+import math
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.dialects.mysql import match
+from database import db
+from models.task import Task
+
+# Từ trong title được tính điểm cao hơn description
+TITLE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+# innodb_ft_min_token_size mặc định của MySQL
+MYSQL_MIN_TOKEN_SIZE = 3
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Tách text thành các từ thường (hỗ trợ tiếng Việt có dấu)"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+def encode_offset_cursor(offset):
+    """Cursor opaque cho kết quả xếp hạng theo điểm (không thể dùng keyset)"""
+    payload = json.dumps(['rank', offset])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_offset_cursor(cursor):
+    """Giải mã cursor của search xếp hạng, raise ValueError nếu không hợp lệ"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        kind, offset = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if kind != 'rank' or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+class TaskSearchIndex:
+    """Inverted index trong process cho SQLite/test (MySQL dùng FULLTEXT index)
+
+    Index được build lần đầu khi search và cập nhật sau mỗi commit có
+    insert/update/delete Task. Các filter (status, group, week...) vẫn chạy
+    bằng SQL nên task đã bị xóa ở process khác sẽ không lọt vào kết quả.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)  # token -> {task_id: weight}
+        self._doc_tokens = {}  # task_id -> set(token)
+        self._vocabulary = []  # tokens đã sort, dùng cho prefix matching
+        self._vocabulary_dirty = False
+        self._built = False
+
+    def invalidate(self):
+        """Bỏ index hiện tại, lần search sau sẽ build lại từ DB"""
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._doc_tokens = {}
+            self._vocabulary = []
+            self._built = False
+
+    def ensure_built(self):
+        with self._lock:
+            if self._built:
+                return
+            rows = db.session.query(Task.id, Task.title, Task.description).yield_per(1000)
+            for task_id, title, description in rows:
+                self._add(task_id, title, description)
+            self._vocabulary_dirty = True
+            self._built = True
+
+    def upsert(self, task_id, title, description):
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(task_id)
+            self._add(task_id, title, description)
+            self._vocabulary_dirty = True
+
+    def remove(self, task_id):
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(task_id)
+            self._vocabulary_dirty = True
+
+    def search(self, terms, prefix=True):
+        """Trả về {task_id: score}; task phải khớp tất cả các từ (AND)"""
+        with self._lock:
+            self.ensure_built()
+            if self._vocabulary_dirty:
+                self._vocabulary = sorted(self._postings)
+                self._vocabulary_dirty = False
+
+            total_docs = max(len(self._doc_tokens), 1)
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                for token in self._expand(term, prefix):
+                    postings = self._postings.get(token, {})
+                    idf = math.log(1 + total_docs / (1 + len(postings)))
+                    for task_id, weight in postings.items():
+                        term_scores[task_id] = max(term_scores[task_id], weight * idf)
+                if scores is None:
+                    scores = dict(term_scores)
+                else:
+                    scores = {task_id: score + term_scores[task_id]
+                              for task_id, score in scores.items() if task_id in term_scores}
+                if not scores:
+                    return {}
+            return scores or {}
+
+    def _expand(self, term, prefix):
+        if not prefix:
+            return [term] if term in self._postings else []
+        start = bisect.bisect_left(self._vocabulary, term)
+        tokens = []
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            tokens.append(token)
+        return tokens
+
+    def _add(self, task_id, title, description):
+        weights = defaultdict(float)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            # Log TF để task lặp 1 từ nhiều lần không lấn át kết quả
+            self._postings[token][task_id] = 1 + math.log(weight)
+        self._doc_tokens[task_id] = set(weights)
+
+    def _remove(self, task_id):
+        for token in self._doc_tokens.pop(task_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(task_id, None)
+                if not postings:
+                    del self._postings[token]
+
+
+task_search_index = TaskSearchIndex()
+
+
+# ✅ Đồng bộ index với các thay đổi Task, chỉ áp dụng sau khi commit thành công
+def _pending_changes(session):
+    return session.info.setdefault('task_search_changes', [])
+
+
+def queue_index_upsert(session, task_id, title, description):
+    """Cập nhật index sau commit cho task ghi bằng Core (bulk insert/update không qua mapper event)"""
+    _pending_changes(session).append(('upsert', task_id, title, description))
+
+
+@event.listens_for(Task, 'after_insert')
+@event.listens_for(Task, 'after_update')
+def _queue_upsert(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        queue_index_upsert(session, target.id, target.title, target.description)
+
+
+@event.listens_for(Task, 'after_delete')
+def _queue_delete(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _pending_changes(session).append(('delete', target.id, None, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    for action, task_id, title, description in session.info.pop('task_search_changes', []):
+        if action == 'upsert':
+            task_search_index.upsert(task_id, title, description)
+        else:
+            task_search_index.remove(task_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('task_search_changes', None)
+
+
+def search_tasks_ranked(query, q, prefix=True, offset=0, limit=50, with_total=False):
+    """Tìm task theo q trên title + description, xếp hạng theo độ liên quan
+
+    query là Task query đã áp dụng các filter (status, priority, group, week...).
+    Trả về (ranked, has_more, total) với ranked là list (task_id, score) đã sort.
+    """
+    terms = tokenize(q)
+    if not terms:
+        return [], False, 0 if with_total else None
+
+    if db.engine.dialect.name == 'mysql':
+        return _search_mysql(query, terms, prefix, offset, limit, with_total)
+    return _search_index(query, terms, prefix, offset, limit, with_total)
+
+
+def _search_mysql(query, terms, prefix, offset, limit, with_total):
+    ft_terms = [t for t in terms if len(t) >= MYSQL_MIN_TOKEN_SIZE]
+    short_terms = [t for t in terms if len(t) < MYSQL_MIN_TOKEN_SIZE]
+    if ft_terms:
+        against = ' '.join(f"+{t}{'*' if prefix else ''}" for t in ft_terms)
+        score = match(Task.title, Task.description, against=against).in_boolean_mode()
+        query = query.filter(score > 0)
+    else:
+        score = db.literal(1.0)
+    # Từ quá ngắn so với FULLTEXT index vẫn phải khớp (AND như index trong bộ nhớ): lọc bằng LIKE
+    for term in short_terms:
+        query = query.filter(db.or_(Task.title.like(f'%{term}%'), Task.description.like(f'%{term}%')))
+
+    total = query.order_by(None).count() if with_total else None
+    rows = query.with_entities(Task.id, score.label('score')).order_by(None).order_by(
+        db.desc('score'), Task.id.desc()
+    ).offset(offset).limit(limit + 1).all()
+
+    ranked = [(task_id, float(s)) for task_id, s in rows]
+    return ranked[:limit], len(ranked) > limit, total
+
+
+def _search_index(query, terms, prefix, offset, limit, with_total):
+    scores = task_search_index.search(terms, prefix)
+    if not scores:
+        return [], False, 0 if with_total else None
+
+    # Áp dụng các filter SQL lên tập task khớp từ khóa
+    allowed = set()
+    hit_ids = list(scores)
+    for i in range(0, len(hit_ids), 500):
+        chunk = hit_ids[i:i + 500]
+        allowed.update(task_id for (task_id,) in query.filter(Task.id.in_(chunk)).with_entities(Task.id).order_by(None))
+
+    ranked = sorted(((task_id, scores[task_id]) for task_id in allowed), key=lambda r: (-r[1], -r[0]))
+    page = ranked[offset:offset + limit]
+    return page, len(ranked) > offset + limit, len(ranked) if with_total else None
@@ -0,0 +1,85 @@
+# utils/task_sync.py - Delta-sync: tasks thay đổi / bị xóa kể từ 1 cursor
+import base64
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from database import db
+
+SYNC_PAGE_SIZE = 500
+MAX_SYNC_PAGE_SIZE = 2000
+# updated_at được gán lúc UPDATE chứ không phải lúc commit, transaction commit muộn
+# có thể mang updated_at cũ hơn cursor. Cursor cuối luôn lùi lại 1 khoảng để đọc lại.
+SYNC_OVERLAP_SECONDS = 5
+
+_TS_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def tombstone_cutoff(config, now=None):
+    """Tombstone trước mốc này bị job dọn xóa (TASK_TOMBSTONE_RETENTION_DAYS)"""
+    return (now or datetime.utcnow()) - timedelta(days=config.get('TASK_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def encode_sync_cursor(task_position, tombstone_position):
+    """Cursor opaque chứa vị trí (timestamp, id) của tasks và tombstones"""
+    payload = json.dumps([
+        [position[0].strftime(_TS_FORMAT), position[1]] if position else None
+        for position in (task_position, tombstone_position)
+    ])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    """Trả về (task_position, tombstone_position), raise ValueError nếu cursor không hợp lệ"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        positions = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if len(positions) != 2:
+            raise ValueError
+        return tuple(
+            (datetime.strptime(position[0], _TS_FORMAT), int(position[1])) if position else None
+            for position in positions
+        )
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def _changed_since(query, ts_column, id_column, position, limit, safe_until):
+    """1 trang theo keyset (ts, id) tăng dần, trả về (items, has_more, position mới)"""
+    if position:
+        ts, last_id = position
+        query = query.filter(db.or_(
+            ts_column > ts,
+            db.and_(ts_column == ts, id_column > last_id)
+        ))
+    items = query.order_by(ts_column, id_column).limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    if has_more:
+        last = items[-1]
+        return items, True, (getattr(last, ts_column.key), last.id)
+    # Trang cuối đã đọc hết tới hiện tại; lùi về safe_until để lần sau đọc lại các thay đổi gần đây
+    return items, False, (safe_until, 0)
+
+
+def fetch_task_changes(task_query, tombstone_query, task_position, tombstone_position, limit):
+    """Lấy tasks upsert + tombstones sau cursor
+
+    task_query / tombstone_query đã lọc theo quyền của user.
+    Trả về (tasks, tombstones, has_more, next_cursor).
+    """
+    from models.task import Task
+    from models.task_tombstone import TaskTombstone
+
+    db_now = db.session.scalar(select(db.func.now()))
+    if isinstance(db_now, str):
+        db_now = datetime.fromisoformat(db_now)
+    safe_until = db_now - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+
+    tasks, tasks_more, task_position = _changed_since(
+        task_query, Task.updated_at, Task.id, task_position, limit, safe_until
+    )
+    tombstones, tombstones_more, tombstone_position = _changed_since(
+        tombstone_query, TaskTombstone.deleted_at, TaskTombstone.id, tombstone_position, limit, safe_until
+    )
+    return tasks, tombstones, tasks_more or tombstones_more, encode_sync_cursor(task_position, tombstone_position)
@@ -0,0 +1,82 @@
+# utils/task_tree.py - Lấy cả cây subtasks bằng 1 recursive CTE
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from database import db
+from models.task import Task
+from models.user import User
+from utils.task_progress import MAX_TREE_DEPTH, progress_from_counts
+
+DEFAULT_TREE_DEPTH = 10
+
+
+def fetch_subtree_rows(task_id, max_depth=DEFAULT_TREE_DEPTH):
+    """Trả về các dòng (task + depth + assignee) của task_id và con cháu tới max_depth"""
+    max_depth = max(0, min(max_depth, MAX_TREE_DEPTH))
+
+    tree = select(
+        Task.id, Task.parent_task_id, Task.title, Task.status, Task.priority,
+        Task.deadline, Task.assignee_id, Task.subtasks_total,
+        db.literal(0).label('depth')
+    ).where(Task.id == task_id).cte('task_tree', recursive=True)
+    child = aliased(Task)
+    tree = tree.union_all(
+        select(
+            child.id, child.parent_task_id, child.title, child.status, child.priority,
+            child.deadline, child.assignee_id, child.subtasks_total,
+            tree.c.depth + 1
+        ).join(child, child.parent_task_id == tree.c.id).where(tree.c.depth < max_depth)
+    )
+
+    return db.session.query(
+        tree, User.name, User.employee_code
+    ).outerjoin(User, User.id == tree.c.assignee_id).order_by(tree.c.depth, tree.c.id).all()
+
+
+def build_task_tree(rows, max_depth):
+    """Ghép các dòng phẳng thành cây lồng nhau, cộng dồn số task theo status"""
+    nodes = {}
+    root = None
+    for row in rows:
+        node = {
+            'id': row.id,
+            'title': row.title,
+            'status': row.status,
+            'priority': row.priority,
+            'deadline': row.deadline.strftime('%Y-%m-%d %H:%M:%S') if row.deadline else None,
+            'depth': row.depth,
+            'assignee': {
+                'id': row.assignee_id,
+                'name': row.name,
+                'employee_code': row.employee_code
+            } if row.assignee_id else None,
+            # Node ở độ sâu tối đa vẫn còn con chưa được load
+            'has_more_subtasks': row.depth >= max_depth and row.subtasks_total > 0,
+            'status_counts': {'todo': 0, 'doing': 0, 'done': 0},
+            'subtasks': []
+        }
+        nodes[row.id] = node
+        if row.depth == 0:
+            root = node
+        elif row.parent_task_id in nodes:
+            nodes[row.parent_task_id]['subtasks'].append(node)
+
+    if root is None:
+        return None
+
+    # Rows đã sort theo depth nên duyệt ngược là đi từ lá lên gốc
+    for row in reversed(rows):
+        node = nodes[row.id]
+        node['status_counts'][node['status']] += 1
+        node['subtree_size'] = sum(node['status_counts'].values())
+        node['progress'] = _subtree_progress(node)
+        if row.depth > 0 and row.parent_task_id in nodes:
+            parent_counts = nodes[row.parent_task_id]['status_counts']
+            for status, count in node['status_counts'].items():
+                parent_counts[status] += count
+    return root
+
+
+def _subtree_progress(node):
+    descendants = node['subtree_size'] - 1
+    done = node['status_counts']['done'] - (1 if node['status'] == 'done' else 0)
+    return progress_from_counts(node['status'], descendants, done)
@@ -0,0 +1,66 @@
+# utils/visibility.py - Phạm vi dữ liệu theo role, biên dịch thành SQL
+#
+# Thay vì load danh sách user của nhóm rồi truyền lại IN (1, 2, ...), các điều kiện ở đây
+# dùng subquery "SELECT id FROM users WHERE group_id = :group_id" nên cả phép lọc chạy
+# trong 1 câu SQL, không phụ thuộc số thành viên của nhóm.
+from sqlalchemy import select, or_
+from models.user import User
+
+
+def group_member_ids(group_id):
+    """Subquery id các user thuộc nhóm"""
+    return select(User.id).where(User.group_id == group_id)
+
+
+def visible_tasks_criterion(user, model):
+    """Điều kiện task user được xem, None nếu xem tất cả (admin)
+
+    Leader xem tasks assign cho members trong nhóm (gồm cả leader) hoặc tasks mình tạo,
+    employee (hoặc leader không có nhóm) chỉ xem tasks của chính mình.
+    model có thể là Task hoặc TaskTombstone (cùng có assignee_id / assigner_id).
+    """
+    if user.role == 'admin':
+        return None
+
+    if user.role == 'leader' and user.group_id:
+        return or_(
+            model.assignee_id.in_(group_member_ids(user.group_id)),
+            model.assigner_id == user.id
+        )
+
+    return or_(
+        model.assignee_id == user.id,
+        model.assigner_id == user.id
+    )
+
+
+def filter_visible_tasks(query, user, model=None):
+    """Lọc query theo quyền xem task của user"""
+    if model is None:
+        from models.task import Task
+        model = Task
+    criterion = visible_tasks_criterion(user, model)
+    return query if criterion is None else query.filter(criterion)
+
+
+def visible_reports_criterion(user):
+    """Điều kiện report user được xem, None nếu xem tất cả (admin)
+
+    Leader xem reports của members trong nhóm, employee (hoặc leader không có nhóm)
+    chỉ xem reports của mình.
+    """
+    from models.report import Report
+
+    if user.role == 'admin':
+        return None
+
+    if user.role == 'leader' and user.group_id:
+        return Report.user_id.in_(group_member_ids(user.group_id))
+
+    return Report.user_id == user.id
+
+
+def filter_visible_reports(query, user):
+    """Lọc query Report theo quyền xem của user"""
+    criterion = visible_reports_criterion(user)
+    return query if criterion is None else query.filter(criterion)
@@ -0,0 +1,35 @@
+# utils/week_calendar.py - Quy đổi tuần ISO (YYYY-Www) dùng chung cho search, report, week_key
+import re
+from datetime import datetime, timedelta
+
+WEEK_RE = re.compile(r'^(\d{4})-W(\d{1,2})$')
+
+
+def parse_week(week):
+    """'2025-W28' -> (year, week_num), raise ValueError nếu sai định dạng hoặc tuần không tồn tại"""
+    match = WEEK_RE.match(week or '')
+    if not match:
+        raise ValueError(f'Invalid week: {week}')
+    year, week_num = int(match.group(1)), int(match.group(2))
+    # fromisocalendar raise ValueError nếu năm không có tuần này (vd: W53)
+    datetime.fromisocalendar(year, week_num, 1)
+    return year, week_num
+
+
+def normalize_week(week):
+    """Chuẩn hóa '2025-W7' -> '2025-W07' để so sánh với Task.week_key"""
+    year, week_num = parse_week(week)
+    return f'{year:04d}-W{week_num:02d}'
+
+
+def week_range(week):
+    """Ngày đầu tuần (thứ 2, 00:00) và ngày đầu tuần sau theo chuẩn ISO 8601"""
+    year, week_num = parse_week(week)
+    start = datetime.fromisocalendar(year, week_num, 1)
+    return start, start + timedelta(days=7)
+
+
+def week_key_for(value):
+    """datetime -> 'YYYY-Www' theo tuần ISO (năm ISO có thể khác năm dương lịch)"""
+    year, week_num, _ = value.isocalendar()
+    return f'{year:04d}-W{week_num:02d}'
@@ -0,0 +1,54 @@
+# worker.py - Process chạy các job nền (nhắc deadline, dọn notifications) tách khỏi web
+#
+# Không đăng ký blueprint / template, chỉ khởi tạo DB và scheduler. Chạy: python worker.py
+# Web process đặt SCHEDULER_ENABLED=false để job không tranh thread và connection pool
+# với request; nhiều worker vẫn chỉ có 1 process chạy job nhờ scheduler lock.
+import signal
+import sys
+import threading
+from flask import Flask
+from database import db
+from config import Config
+from app import wait_for_db, run_schema_migrations
+
+def create_worker_app():
+    """Flask app tối thiểu cho worker: config + DB, không có route"""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    db.init_app(app)
+
+    with app.app_context():
+        wait_for_db()
+
+        from models import user, task, file, report, group, notification, join_request, task_tombstone, scheduler_state, data_version
+        import utils.subtask_counters  # Đăng ký event giữ counter subtasks đồng bộ
+        import utils.data_versions  # Đăng ký event tăng version tasks/users/groups cho ETag
+        run_schema_migrations()
+
+    return app
+
+def main():
+    app = create_worker_app()
+
+    from utils.notification_scheduler import setup_notification_scheduler
+    setup_notification_scheduler(app)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"🛑 Worker received signal {signum}, shutting down")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print("🚀 Background worker running")
+    while not stop_event.is_set():
+        stop_event.wait(60)
+
+    # sys.exit chạy các hàm atexit: dừng scheduler, timer và nhả scheduler lock
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()